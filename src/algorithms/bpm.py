@@ -0,0 +1,73 @@
+from typing import TypeVar, List, Dict, Tuple, Iterable
+
+T = TypeVar('T')
+
+
+def match_masks(pattern: List[T]) -> Dict[object, int]:
+    masks: Dict[object, int] = {}
+    bit = 1
+    for item in pattern:
+        masks[item] = masks.get(item, 0) | bit
+        bit <<= 1
+    return masks
+
+
+def lcs_from_masks(masks: Dict[object, int], pattern_len: int, text: List[T]) -> int:
+    if pattern_len == 0 or not text:
+        return 0
+    full = (1 << pattern_len) - 1
+    v = full
+    get = masks.get
+    for item in text:
+        u = v & get(item, 0)
+        v = ((v + u) | (v - u)) & full
+    return pattern_len - bin(v).count('1')
+
+
+def levenshtein_row(pattern: List[T], text: List[T]) -> List[int]:
+    return levenshtein_row_from_masks(match_masks(pattern), len(pattern), text)
+
+
+def levenshtein_row_from_masks(masks: Dict[object, int], pattern_len: int, text: Iterable[T]) -> List[int]:
+    n = pattern_len
+    if n == 0:
+        return list(range(sum(1 for _ in text) + 1))
+    get = masks.get
+    full = (1 << n) - 1
+    top = 1 << (n - 1)
+    pv = full
+    mv = 0
+    score = n
+    row = [n]
+    append = row.append
+    for item in text:
+        eq = get(item, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (full & ~(xh | pv))
+        mh = pv & xh
+        if ph & top:
+            score += 1
+        elif mh & top:
+            score -= 1
+        ph = ((ph << 1) | 1) & full
+        mh = (mh << 1) & full
+        pv = mh | (full & ~(xv | ph))
+        mv = ph & xv
+        append(score)
+    return row
+
+
+def _pattern_and_text(a: List[T], b: List[T]) -> Tuple[List[T], List[T]]:
+    return (a, b) if len(a) >= len(b) else (b, a)
+
+
+def bpm_lcs_length(a: List[T], b: List[T]) -> int:
+    pattern, text = _pattern_and_text(a, b)
+    if not text:
+        return 0
+    return lcs_from_masks(match_masks(pattern), len(pattern), text)
+
+
+def bpm_edit_distance(a: List[T], b: List[T]) -> int:
+    return len(a) + len(b) - 2 * bpm_lcs_length(a, b)
@@ -1,5 +1,11 @@
-from typing import TypeVar, List, Dict, Tuple, Optional
-from .utils import EditAction, EditScript, OpType, make_insert, make_delete, make_equal
+from typing import TypeVar, List, Dict, Tuple, Optional, Iterable
+from itertools import islice, repeat
+from functools import lru_cache
+from operator import add
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from .bpm import match_masks, lcs_from_masks, levenshtein_row_from_masks
+from .utils import (EditAction, EditScript, OpType, make_insert, make_delete, make_equal, intern_pair,
+                    intern_sequence, common_prefix_length, common_suffix_length)
 
 T = TypeVar('T')
 
@@ -7,84 +13,124 @@ class HirschbergDiff:
     def __init__(self, original: List[T], modified: List[T]):
         self.original = original
         self.modified = modified
+        self._a: List[object] = []
+        self._b: List[object] = []
         
     def compute(self) -> EditScript:
-        return self._hirschberg(self.original, self.modified)
+        ids = intern_pair(self.original, self.modified)
+        self._a, self._b = ids or (self.original, self.modified)
+        return self._hirschberg(0, len(self.original), 0, len(self.modified))
     
-    def _hirschberg(self, a: List[T], b: List[T]) -> EditScript:
-        n = len(a)
-        m = len(b)
-        if n == 0:
-            return [make_insert(item) for item in b]
-        if m == 0:
-            return [make_delete(item) for item in a]
-        if n == 1:
-            return self._diff_single_element(a[0], b)
-        if m == 1:
-            return self._diff_against_single(a, b[0])
-        mid = n // 2
-        score_left = self._score_forward(a[:mid], b)
-        score_right = self._score_backward(a[mid:], b)
-        combined = [score_left[j] + score_right[m - j] for j in range(m + 1)]
-        split_j = combined.index(max(combined))
-        left_result = self._hirschberg(a[:mid], b[:split_j])
-        right_result = self._hirschberg(a[mid:], b[split_j:])
-        return left_result + right_result
-    
-    def _score_forward(self, a: List[T], b: List[T]) -> List[int]:
-        n = len(a)
-        m = len(b)
-        prev = list(range(m + 1))
-        curr = [0] * (m + 1)
-        for i in range(1, n + 1):
-            curr[0] = i
-            for j in range(1, m + 1):
-                if a[i - 1] == b[j - 1]:
-                    curr[j] = prev[j - 1]
-                else:
-                    curr[j] = 1 + min(prev[j], curr[j - 1], prev[j - 1])
-            prev, curr = curr, prev
-        return [m - x for x in prev]
-    
-    def _score_backward(self, a: List[T], b: List[T]) -> List[int]:
-        return self._score_forward(a[::-1], b[::-1])[::-1]
-    
-    def _diff_single_element(self, elem: T, b: List[T]) -> EditScript:
-        result = []
-        found = False
-        for i, item in enumerate(b):
-            if item == elem and not found:
-                result.append(make_equal(elem))
-                found = True
+    def _hirschberg(self, a_lo: int, a_hi: int, b_lo: int, b_hi: int) -> EditScript:
+        a, b = self._a, self._b
+        original, modified = self.original, self.modified
+        result: EditScript = []
+        extend = result.extend
+        stack = [(a_lo, a_hi, b_lo, b_hi)]
+        push, pop = stack.append, stack.pop
+        while stack:
+            a_lo, a_hi, b_lo, b_hi = pop()
+            start = a_lo
+            while a_lo < a_hi and b_lo < b_hi and a[a_lo] == b[b_lo]:
+                a_lo += 1
+                b_lo += 1
+            extend(map(make_equal, original[start:a_lo]))
+            a_end, b_end = a_hi, b_hi
+            while a_lo < a_hi and b_lo < b_hi and a[a_hi - 1] == b[b_hi - 1]:
+                a_hi -= 1
+                b_hi -= 1
+            if a_hi < a_end:
+                push((a_hi, a_end, b_hi, b_end))
+            n = a_hi - a_lo
+            m = b_hi - b_lo
+            if n == 0:
+                extend(map(make_insert, modified[b_lo:b_hi]))
+            elif m == 0:
+                extend(map(make_delete, original[a_lo:a_hi]))
+            elif n == 1:
+                extend(self._diff_single_element(a_lo, b_lo, b_hi))
+            elif m == 1:
+                extend(self._diff_against_single(a_lo, a_hi, b_lo))
             else:
-                result.append(make_insert(item))
-        if not found:
-            result.insert(0, make_delete(elem))
+                mid = a_lo + n // 2
+                cost_left = self._score_forward(a_lo, mid, b_lo, b_hi)
+                cost_right = self._score_backward(mid, a_hi, b_lo, b_hi)
+                combined = list(map(add, cost_left, reversed(cost_right)))
+                split_j = b_lo + combined.index(min(combined))
+                push((mid, a_hi, split_j, b_hi))
+                push((a_lo, mid, b_lo, split_j))
         return result
     
-    def _diff_against_single(self, a: List[T], elem: T) -> EditScript:
-        result = []
-        found = False
-        for item in a:
-            if item == elem and not found:
-                result.append(make_equal(elem))
-                found = True
-            else:
-                result.append(make_delete(item))
-        if not found:
-            result.append(make_insert(elem))
+    def _score_forward(self, a_lo: int, a_hi: int, b_lo: int, b_hi: int) -> List[int]:
+        return _cost_row(self._a, range(a_lo, a_hi), self._b, range(b_lo, b_hi))
+    
+    def _score_backward(self, a_lo: int, a_hi: int, b_lo: int, b_hi: int) -> List[int]:
+        return _cost_row(self._a, range(a_hi - 1, a_lo - 1, -1), self._b, range(b_hi - 1, b_lo - 1, -1))
+    
+    def _diff_single_element(self, a_idx: int, b_lo: int, b_hi: int) -> EditScript:
+        modified = self.modified
+        try:
+            k = self._b.index(self._a[a_idx], b_lo, b_hi)
+        except ValueError:
+            return [make_delete(self.original[a_idx])] + list(map(make_insert, modified[b_lo:b_hi]))
+        result = list(map(make_insert, modified[b_lo:k]))
+        result.append(make_equal(self.original[a_idx]))
+        result.extend(map(make_insert, modified[k + 1:b_hi]))
+        return result
+    
+    def _diff_against_single(self, a_lo: int, a_hi: int, b_idx: int) -> EditScript:
+        original = self.original
+        try:
+            k = self._a.index(self._b[b_idx], a_lo, a_hi)
+        except ValueError:
+            result = list(map(make_delete, original[a_lo:a_hi]))
+            result.append(make_insert(self.modified[b_idx]))
+            return result
+        result = list(map(make_delete, original[a_lo:k]))
+        result.append(make_equal(original[k]))
+        result.extend(map(make_delete, original[k + 1:a_hi]))
         return result
 
+def _cost_row(a: List[T], a_range: range, b: List[T], b_range: range) -> List[int]:
+    try:
+        return levenshtein_row_from_masks(match_masks(map(a.__getitem__, a_range)), len(a_range),
+                                          map(b.__getitem__, b_range))
+    except TypeError:
+        return _score_row(map(a.__getitem__, a_range), list(map(b.__getitem__, b_range)))
+
+def _score_row(a: Iterable[T], b: List[T]) -> List[int]:
+    prev = list(range(len(b) + 1))
+    for item in a:
+        diag = prev[0]
+        left = diag + 1
+        row = [left]
+        append = row.append
+        for other, up in zip(b, islice(prev, 1, None)):
+            if item == other:
+                left = diag
+            else:
+                if up < left:
+                    left = up
+                if diag < left:
+                    left = diag
+                left += 1
+            append(left)
+            diag = up
+        prev = row
+    return prev
+
 def diff_linear(original: List[T], modified: List[T]) -> EditScript:
     differ = HirschbergDiff(original, modified)
     return differ.compute()
 
 class LinearSpaceMyers:
-    def __init__(self, original: List[T], modified: List[T]):
+    def __init__(self, original: List[T], modified: List[T],
+                 ids: Optional[Tuple[List[int], List[int]]] = None):
         self.original = original
         self.modified = modified
         self.n = len(original)
         self.m = len(modified)
+        self._ids = ids
         
     def compute(self) -> EditScript:
         if self.n == 0 and self.m == 0:
@@ -93,19 +139,26 @@ class LinearSpaceMyers:
             return [make_insert(item) for item in self.modified]
         if self.m == 0:
             return [make_delete(item) for item in self.original]
-        return self._lcs_diff(0, self.n, 0, self.m)
+        ids = self._ids or intern_pair(self.original, self.modified)
+        self._a, self._b = ids or (self.original, self.modified)
+        prefix = common_prefix_length(self._a, self._b)
+        suffix = common_suffix_length(self._a, self._b, prefix)
+        head = [make_equal(item) for item in self.original[:prefix]]
+        middle = self._lcs_diff(prefix, self.n - suffix, prefix, self.m - suffix)
+        tail = [make_equal(item) for item in self.original[self.n - suffix:]]
+        return head + middle + tail
     
     def _lcs_diff(self, x_start: int, x_end: int, y_start: int, y_end: int) -> EditScript:
-        a = self.original[x_start:x_end]
-        b = self.modified[y_start:y_end]
-        n = len(a)
-        m = len(b)
+        n = x_end - x_start
+        m = y_end - y_start
         if n == 0:
-            return [make_insert(item) for item in b]
+            return [make_insert(item) for item in self.modified[y_start:y_end]]
         if m == 0:
-            return [make_delete(item) for item in a]
+            return [make_delete(item) for item in self.original[x_start:x_end]]
+        a = self._a[x_start:x_end]
+        b = self._b[y_start:y_end]
         if n == 1 or m == 1:
-            return self._simple_diff(a, b)
+            return self._simple_diff(x_start, x_end, y_start, y_end)
         snake = self._find_middle_snake(a, b)
         x_mid, y_mid, u, v, d = snake
         if d > 1:
@@ -116,28 +169,25 @@ class LinearSpaceMyers:
             right = self._lcs_diff(x_start + u, x_end, y_start + v, y_end)
             return left + middle + right
         else:
-            return self._simple_diff(a, b)
-    
-    def _simple_diff(self, a: List[T], b: List[T]) -> EditScript:
-        result = []
-        i = j = 0
-        while i < len(a) and j < len(b):
-            if a[i] == b[j]:
-                result.append(make_equal(a[i]))
-                i += 1
-                j += 1
-            elif i < len(a):
-                result.append(make_delete(a[i]))
-                i += 1
-            else:
-                result.append(make_insert(b[j]))
-                j += 1
-        while i < len(a):
-            result.append(make_delete(a[i]))
-            i += 1
-        while j < len(b):
-            result.append(make_insert(b[j]))
+            return self._simple_diff(x_start, x_end, y_start, y_end)
+    
+    def _simple_diff(self, x_start: int, x_end: int, y_start: int, y_end: int) -> EditScript:
+        a, b = self._a, self._b
+        original, modified = self.original, self.modified
+        result: EditScript = []
+        extend = result.extend
+        i, j = x_start, y_start
+        while i < x_end and j < y_end:
+            try:
+                k = a.index(b[j], i, x_end)
+            except ValueError:
+                break
+            extend(map(make_delete, original[i:k]))
+            result.append(make_equal(original[k]))
+            i = k + 1
             j += 1
+        extend(map(make_delete, original[i:x_end]))
+        extend(map(make_insert, modified[j:y_end]))
         return result
     
     def _find_middle_snake(self, a: List[T], b: List[T]) -> Tuple[int, int, int, int, int]:
@@ -149,60 +199,83 @@ class LinearSpaceMyers:
         v_backward = [0] * v_size
         delta = n - m
         odd = delta % 2 != 0
-        def vf(k: int) -> int:
-            return v_forward[k + max_d]
-        def vb(k: int) -> int:
-            return v_backward[k + max_d]
-        def set_vf(k: int, val: int):
-            v_forward[k + max_d] = val
-        def set_vb(k: int, val: int):
-            v_backward[k + max_d] = val
         for d in range(max_d + 1):
             for k in range(-d, d + 1, 2):
-                if k == -d or (k != d and vf(k - 1) < vf(k + 1)):
-                    x = vf(k + 1)
+                i = k + max_d
+                if k == -d or (k != d and v_forward[i - 1] < v_forward[i + 1]):
+                    x = v_forward[i + 1]
                 else:
-                    x = vf(k - 1) + 1
+                    x = v_forward[i - 1] + 1
                 y = x - k
                 x_start, y_start = x, y
                 while x < n and y < m and a[x] == b[y]:
                     x += 1
                     y += 1
-                set_vf(k, x)
+                v_forward[i] = x
                 if odd and -(d - 1) <= k - delta <= (d - 1):
-                    if vf(k) + vb(delta - k) >= n:
+                    if x + v_backward[delta - k + max_d] >= n:
                         return (x_start, y_start, x, y, 2 * d - 1)
             for k in range(-d, d + 1, 2):
-                if k == -d or (k != d and vb(k - 1) < vb(k + 1)):
-                    x = vb(k + 1)
+                i = k + max_d
+                if k == -d or (k != d and v_backward[i - 1] < v_backward[i + 1]):
+                    x = v_backward[i + 1]
                 else:
-                    x = vb(k - 1) + 1
+                    x = v_backward[i - 1] + 1
                 y = x - k
                 while x < n and y < m and a[n - 1 - x] == b[m - 1 - y]:
                     x += 1
                     y += 1
-                set_vb(k, x)
+                v_backward[i] = x
                 if not odd and -d <= k - delta <= d:
-                    if vb(k) + vf(delta - k) >= n:
-                        x_end = n - vb(k)
-                        y_end = m - (vb(k) - k)
+                    if x + v_forward[delta - k + max_d] >= n:
+                        x_end = n - x
+                        y_end = m - (x - k)
                         return (x_end, y_end, n - x, m - y, 2 * d)
         return (0, 0, n, m, n + m)
 
 
-def diff_linear_myers(original: List[T], modified: List[T]) -> EditScript:
-    differ = LinearSpaceMyers(original, modified)
+def diff_linear_myers(original: List[T], modified: List[T],
+                      ids: Optional[Tuple[List[int], List[int]]] = None) -> EditScript:
+    differ = LinearSpaceMyers(original, modified, ids)
     return differ.compute()
 
+_EXECUTORS = {'thread': ThreadPoolExecutor, 'process': ProcessPoolExecutor}
+
 class DiffEngine:
-    def __init__(self, use_linear_space: bool = False):
+    def __init__(self, use_linear_space: bool = False, cache_size: int = 256):
         self.use_linear_space = use_linear_space
+        self.cache_size = cache_size
+        self._diff_cached = lru_cache(maxsize=cache_size)(self._diff_tuples)
+        
+    def __getstate__(self) -> Dict[str, object]:
+        return {'use_linear_space': self.use_linear_space, 'cache_size': self.cache_size}
+    
+    def __setstate__(self, state: Dict[str, object]):
+        self.__init__(**state)
         
-    def diff(self, original: List[T], modified: List[T]) -> EditScript:
+    def diff(self, original: List[T], modified: List[T],
+             ids: Optional[Tuple[List[int], List[int]]] = None) -> EditScript:
+        if ids is None:
+            try:
+                return list(self._diff_cached(tuple(original), tuple(modified)))
+            except TypeError:
+                pass
+        return self._diff(original, modified, ids)
+    
+    def _diff(self, original: List[T], modified: List[T],
+              ids: Optional[Tuple[List[int], List[int]]] = None) -> EditScript:
+        if ids is None:
+            ids = intern_pair(original, modified)
         if self.use_linear_space:
-            return diff_linear_myers(original, modified)
-        from .myers import diff
-        return diff(original, modified)
+            return diff_linear_myers(original, modified, ids)
+        from .myers import MyersDiff
+        return MyersDiff(original, modified, ids).compute()
+    
+    def _diff_tuples(self, original: Tuple, modified: Tuple) -> Tuple[EditAction, ...]:
+        return tuple(self._diff(original, modified))
+    
+    def clear_cache(self):
+        self._diff_cached.cache_clear()
     
     def diff_strings(self, original: str, modified: str, by_line: bool = True) -> EditScript:
         if by_line:
@@ -214,25 +287,69 @@ class DiffEngine:
         return self.diff(orig_lines, mod_lines)
     
     def compute_lcs(self, a: List[T], b: List[T]) -> List[T]:
-        script = self.diff(a, b)
-        return [action.value for action in script if action.op == OpType.EQUAL]
+        equal = OpType.EQUAL
+        return [action.value for action in self.diff(a, b) if action.op is equal]
     
     def compute_edit_distance(self, a: List[T], b: List[T]) -> int:
-        script = self.diff(a, b)
-        return sum(1 for action in script if action.op != OpType.EQUAL)
+        try:
+            script = self._diff_cached(tuple(a), tuple(b))
+        except TypeError:
+            script = self._diff(a, b)
+        equal = OpType.EQUAL
+        return sum(1 for action in script if action.op is not equal)
 
 class BatchDiffer:
-    def __init__(self, engine: Optional[DiffEngine] = None):
+    def __init__(self, engine: Optional[DiffEngine] = None,
+                 max_workers: Optional[int] = None, backend: str = 'thread'):
+        if backend not in _EXECUTORS:
+            raise ValueError(f"Unknown backend: {backend}")
         self.engine = engine or DiffEngine()
+        self.max_workers = max_workers
+        self.backend = backend
+        
+    def _map(self, count: int, *iterables: Iterable) -> List[EditScript]:
+        if not self.max_workers or self.max_workers < 2 or count < 2:
+            return list(map(self.engine.diff, *iterables))
+        chunksize = max(1, count // (4 * self.max_workers))
+        with _EXECUTORS[self.backend](max_workers=self.max_workers) as executor:
+            return list(executor.map(self.engine.diff, *iterables, chunksize=chunksize))
         
     def diff_multiple(self, pairs: List[Tuple[List[T], List[T]]]) -> List[EditScript]:
-        results = []
-        for orig, mod in pairs:
-            results.append(self.engine.diff(orig, mod))
-        return results
+        return self._map(len(pairs), [orig for orig, _ in pairs], [mod for _, mod in pairs])
     
     def diff_all_against_base(self, base: List[T], targets: List[List[T]]) -> List[EditScript]:
-        results = []
+        table: Dict[object, int] = {}
+        try:
+            base_ids: Optional[List[int]] = intern_sequence(base, table)
+        except TypeError:
+            base_ids = None
+        all_ids = []
         for target in targets:
-            results.append(self.engine.diff(base, target))
-        return results
\ No newline at end of file
+            ids = None
+            if base_ids is not None:
+                try:
+                    ids = (base_ids, intern_sequence(target, table))
+                except TypeError:
+                    pass
+            all_ids.append(ids)
+        return self._map(len(targets), repeat(base), targets, all_ids)
+    
+    def lcs_lengths(self, base: List[T], targets: List[List[T]]) -> List[int]:
+        try:
+            masks = match_masks(base)
+            return [lcs_from_masks(masks, len(base), target) for target in targets]
+        except TypeError:
+            from .myers import lcs_length
+            return [lcs_length(base, target) for target in targets]
+    
+    def edit_distances(self, base: List[T], targets: List[List[T]]) -> List[int]:
+        n = len(base)
+        return [n + len(target) - 2 * lcs for target, lcs in zip(targets, self.lcs_lengths(base, targets))]
+    
+    def similarity_ratios(self, base: List[T], targets: List[List[T]]) -> List[float]:
+        n = len(base)
+        ratios = []
+        for target, lcs in zip(targets, self.lcs_lengths(base, targets)):
+            total = n + len(target)
+            ratios.append(2.0 * lcs / total if total > 0 else 1.0)
+        return ratios
@@ -1,74 +1,112 @@
-from typing import TypeVar, List, Dict, Optional, Any, Tuple
-from .utils import EditAction, EditScript, OpType, make_insert, make_delete, make_equal, DiffResult
+from typing import TypeVar, List, Optional, Any, Tuple, Callable
+from .utils import (EditScript, OpType, DiffResult, intern_pair, group_consecutive_ops, common_prefix_length,
+                    common_suffix_length, PackedScript, OP_INSERT, OP_DELETE, OP_EQUAL)
+from .bpm import bpm_lcs_length
 
 T = TypeVar('T')
 
 class MyersDiff:
-    def __init__(self, original: List[T], modified: List[T]):
+    def __init__(self, original: List[T], modified: List[T],
+                 ids: Optional[Tuple[List[int], List[int]]] = None):
         self.original = original
         self.modified = modified
         self.n = len(original)
         self.m = len(modified)
-        self._trace: List[Dict[int, int]] = []
+        self._ids = ids
+        self._trace: List[int] = []
         self._edit_distance: Optional[int] = None
+        self._a: List[object] = []
+        self._b: List[object] = []
+        self._prefix = 0
         
     def compute(self) -> EditScript:
+        return self.compute_packed().to_script()
+    
+    def compute_packed(self) -> PackedScript:
         if self.n == 0 and self.m == 0:
-            return []
+            return PackedScript()
         if self.n == 0:
-            return [make_insert(item) for item in self.modified]
+            return PackedScript(bytearray([OP_INSERT]) * self.m, list(self.modified))
         if self.m == 0:
-            return [make_delete(item) for item in self.original]
+            return PackedScript(bytearray([OP_DELETE]) * self.n, list(self.original))
+        ids = self._ids or intern_pair(self.original, self.modified)
+        a, b = ids or (self.original, self.modified)
+        prefix = common_prefix_length(a, b)
+        suffix = common_suffix_length(a, b, prefix)
+        self._prefix = prefix
+        self._a = a[prefix:self.n - suffix]
+        self._b = b[prefix:self.m - suffix]
         self._trace = self._find_path()
-        return self._trace_path()
+        packed = self._trace_path()
+        if prefix or suffix:
+            packed.ops[:0] = bytes([OP_EQUAL]) * prefix
+            packed.ops += bytes([OP_EQUAL]) * suffix
+            packed.values[:0] = self.original[:prefix]
+            packed.values += self.original[self.n - suffix:]
+        return packed
     
-    def _find_path(self) -> List[Dict[int, int]]:
-        n, m = self.n, self.m
+    def _find_path(self) -> List[int]:
+        a, b = self._a, self._b
+        n, m = len(a), len(b)
         max_d = n + m
-        v: Dict[int, int] = {1: 0}
-        trace: List[Dict[int, int]] = []
+        offset = max_d + 1
+        v = [0] * (2 * max_d + 3)
+        trace: List[int] = []
+        extend = trace.extend
         for d in range(max_d + 1):
-            trace.append(v.copy())
+            extend(v[offset - d - 1:offset + d + 2])
             for k in range(-d, d + 1, 2):
-                if k == -d or (k != d and v.get(k - 1, 0) < v.get(k + 1, 0)):
-                    x = v.get(k + 1, 0)
+                i = offset + k
+                if k == -d or (k != d and v[i - 1] < v[i + 1]):
+                    x = v[i + 1]
                 else:
-                    x = v.get(k - 1, 0) + 1
+                    x = v[i - 1] + 1
                 y = x - k
-                while x < n and y < m and self.original[x] == self.modified[y]:
+                while x < n and y < m and a[x] == b[y]:
                     x += 1
                     y += 1
-                v[k] = x
+                v[i] = x
                 if x >= n and y >= m:
                     self._edit_distance = d
                     return trace
         return trace
     
-    def _trace_path(self) -> EditScript:
-        x, y = self.n, self.m
-        script_reversed: List[EditAction] = []
-        for d in range(len(self._trace) - 1, -1, -1):
-            v = self._trace[d]
+    def _trace_path(self) -> PackedScript:
+        original, modified = self.original, self.modified
+        prefix = self._prefix
+        x, y = len(self._a), len(self._b)
+        edit_distance = self._edit_distance or 0
+        w = (x + y + edit_distance) // 2
+        ops = bytearray(w)
+        values: List[object] = [None] * w
+        trace = self._trace
+        for d in range(edit_distance, -1, -1):
             k = x - y
-            if k == -d or (k != d and v.get(k - 1, 0) < v.get(k + 1, 0)):
+            i = d * d + 3 * d + 1 + k
+            if k == -d or (k != d and trace[i - 1] < trace[i + 1]):
                 prev_k = k + 1
+                prev_x = trace[i + 1]
             else:
                 prev_k = k - 1
-            prev_x = v.get(prev_k, 0)
+                prev_x = trace[i - 1]
             prev_y = prev_x - prev_k
             while x > prev_x and y > prev_y:
                 x -= 1
                 y -= 1
-                script_reversed.append(make_equal(self.original[x]))
+                w -= 1
+                ops[w] = OP_EQUAL
+                values[w] = original[prefix + x]
             if d > 0:
+                w -= 1
                 if x == prev_x:
                     y -= 1
-                    script_reversed.append(make_insert(self.modified[y]))
+                    ops[w] = OP_INSERT
+                    values[w] = modified[prefix + y]
                 else:
                     x -= 1
-                    script_reversed.append(make_delete(self.original[x]))
-        script_reversed.reverse()
-        return script_reversed
+                    ops[w] = OP_DELETE
+                    values[w] = original[prefix + x]
+        return PackedScript(ops, values)
     
     def get_edit_distance(self) -> int:
         if self._edit_distance is None:
@@ -79,45 +117,61 @@ class MyersDiff:
         script = self.compute()
         return DiffResult.from_script(script, self.n, self.m)
 
-def diff(original: List[T], modified: List[T]) -> EditScript:
-    differ = MyersDiff(original, modified)
+def diff(original: List[T], modified: List[T],
+         key: Optional[Callable[[T], Any]] = None) -> EditScript:
+    ids = None
+    if key is not None:
+        keys_a = list(map(key, original))
+        keys_b = list(map(key, modified))
+        ids = intern_pair(keys_a, keys_b) or (keys_a, keys_b)
+    differ = MyersDiff(original, modified, ids)
     return differ.compute()
 
+def _check_run(original: List[T], start: int, op: OpType, values: List[object]):
+    name = 'EQUAL' if op == OpType.EQUAL else 'DELETE'
+    for idx, value in enumerate(values, start):
+        if idx >= len(original):
+            raise ValueError(f"Script inconsistent at {name}, index {idx}")
+        if original[idx] != value:
+            if op == OpType.EQUAL:
+                raise ValueError(f"Mismatch at {idx}: {original[idx]} != {value}")
+            raise ValueError(f"DELETE mismatch at {idx}")
+
 def patch(original: List[T], script: EditScript) -> List[T]:
     result: List[T] = []
     orig_idx = 0
-    for action in script:
-        if action.op == OpType.EQUAL:
-            if orig_idx >= len(original):
-                raise ValueError(f"Script inconsistent at EQUAL, index {orig_idx}")
-            if original[orig_idx] != action.value:
-                raise ValueError(f"Mismatch at {orig_idx}: {original[orig_idx]} != {action.value}")
-            result.append(action.value)
-            orig_idx += 1
-        elif action.op == OpType.DELETE:
-            if orig_idx >= len(original):
-                raise ValueError(f"Script inconsistent at DELETE, index {orig_idx}")
-            if original[orig_idx] != action.value:
-                raise ValueError(f"DELETE mismatch at {orig_idx}")
-            orig_idx += 1
-        elif action.op == OpType.INSERT:
-            result.append(action.value)
-        elif action.op == OpType.REPLACE:
-            if orig_idx >= len(original):
-                raise ValueError(f"Script inconsistent at REPLACE, index {orig_idx}")
-            result.append(action.value)
-            orig_idx += 1
-    if orig_idx != len(original):
-        raise ValueError(f"Script incomplete: consumed {orig_idx} of {len(original)}")
+    n = len(original)
+    for op, values in group_consecutive_ops(script):
+        end = orig_idx + len(values)
+        if op == OpType.INSERT:
+            result.extend(values)
+        elif op == OpType.EQUAL or op == OpType.DELETE:
+            chunk = original[orig_idx:end]
+            if type(chunk) is not list:
+                chunk = list(chunk)
+            if chunk != values:
+                _check_run(original, orig_idx, op, values)
+            if op == OpType.EQUAL:
+                result.extend(values)
+            orig_idx = end
+        elif op == OpType.REPLACE:
+            if end > n:
+                raise ValueError(f"Script inconsistent at REPLACE, index {n}")
+            result.extend(values)
+            orig_idx = end
+    if orig_idx != n:
+        raise ValueError(f"Script incomplete: consumed {orig_idx} of {n}")
     return result
 
 def edit_distance(original: List[T], modified: List[T]) -> int:
-    differ = MyersDiff(original, modified)
-    return differ.get_edit_distance()
+    return len(original) + len(modified) - 2 * lcs_length(original, modified)
 
 def lcs_length(original: List[T], modified: List[T]) -> int:
-    script = diff(original, modified)
-    return sum(1 for action in script if action.op == OpType.EQUAL)
+    try:
+        return bpm_lcs_length(original, modified)
+    except TypeError:
+        script = diff(original, modified)
+        return sum(1 for action in script if action.op == OpType.EQUAL)
 
 def similarity_ratio(original: List[T], modified: List[T]) -> float:
     if not original and not modified:
@@ -151,40 +205,43 @@ def find_middle_snake(original: List[T], modified: List[T],
     if n == 0 or m == 0:
         return (0, 0, 0, 0, n + m)
     max_d = (n + m + 1) // 2
-    v_forward: Dict[int, int] = {1: 0}
-    v_backward: Dict[int, int] = {1: 0}
+    offset = max_d + 1
+    v_forward = [0] * (2 * max_d + 3)
+    v_backward = [0] * (2 * max_d + 3)
     delta = n - m
     odd = delta % 2 != 0
     for d in range(max_d + 1):
         for k in range(-d, d + 1, 2):
-            if k == -d or (k != d and v_forward.get(k - 1, 0) < v_forward.get(k + 1, 0)):
-                x = v_forward.get(k + 1, 0)
+            i = offset + k
+            if k == -d or (k != d and v_forward[i - 1] < v_forward[i + 1]):
+                x = v_forward[i + 1]
             else:
-                x = v_forward.get(k - 1, 0) + 1
+                x = v_forward[i - 1] + 1
             y = x - k
             x_start, y_start = x, y
             while x < n and y < m and original[x] == modified[y]:
                 x += 1
                 y += 1
-            v_forward[k] = x
+            v_forward[i] = x
             if odd and (k - delta) >= -(d - 1) and (k - delta) <= (d - 1):
-                if v_forward[k] + v_backward.get(delta - k, 0) >= n:
+                if x + v_backward[offset + delta - k] >= n:
                     return (x_start + x_offset, y_start + y_offset,
                             x + x_offset, y + y_offset, 2 * d - 1)
         for k in range(-d, d + 1, 2):
-            if k == -d or (k != d and v_backward.get(k - 1, 0) < v_backward.get(k + 1, 0)):
-                x = v_backward.get(k + 1, 0)
+            i = offset + k
+            if k == -d or (k != d and v_backward[i - 1] < v_backward[i + 1]):
+                x = v_backward[i + 1]
             else:
-                x = v_backward.get(k - 1, 0) + 1
+                x = v_backward[i - 1] + 1
             y = x - k
             while x < n and y < m and original[n - 1 - x] == modified[m - 1 - y]:
                 x += 1
                 y += 1
-            v_backward[k] = x
+            v_backward[i] = x
             if not odd and (k - delta) >= -d and (k - delta) <= d:
-                if v_backward[k] + v_forward.get(delta - k, 0) >= n:
-                    x_end = n - v_backward[k]
-                    y_end = m - (v_backward[k] - k)
+                if x + v_forward[offset + delta - k] >= n:
+                    x_end = n - x
+                    y_end = m - (x - k)
                     return (x_end + x_offset, y_end + y_offset,
                             n - x + x_offset, m - y + y_offset, 2 * d)
-    return (0, 0, n, m, n + m)
\ No newline at end of file
+    return (0, 0, n, m, n + m)
@@ -1,9 +1,14 @@
-from typing import TypeVar, List, Tuple, NamedTuple, Optional, Callable, Iterator
+from typing import TypeVar, List, Tuple, NamedTuple, Optional, Callable, Iterator, Dict
 from enum import Enum
+import re
 from dataclasses import dataclass, field
+from itertools import groupby
+from operator import itemgetter, attrgetter
 
 T = TypeVar('T')
 
+_WORD_RE = re.compile(r'\S+|\s+')
+
 class OpType(str, Enum):
     INSERT = 'insert'
     DELETE = 'delete'
@@ -24,6 +29,52 @@ class EditAction(NamedTuple):
 EditScript = List[EditAction]
 
 
+OP_INSERT = 0
+OP_DELETE = 1
+OP_EQUAL = 2
+OP_REPLACE = 3
+
+OP_TYPES = (OpType.INSERT, OpType.DELETE, OpType.EQUAL, OpType.REPLACE)
+OP_CODES = {op: code for code, op in enumerate(OP_TYPES)}
+
+CHANGE_RUN = re.compile(b'[^%c]+' % OP_EQUAL)
+
+
+@dataclass
+class PackedScript:
+    ops: bytearray = field(default_factory=bytearray)
+    values: List[object] = field(default_factory=list)
+    old_values: Optional[List[object]] = None
+    
+    def __len__(self) -> int:
+        return len(self.ops)
+    
+    def __iter__(self) -> Iterator[EditAction]:
+        types = OP_TYPES
+        if self.old_values is None:
+            for code, value in zip(self.ops, self.values):
+                yield EditAction(types[code], value)
+        else:
+            for code, value, old in zip(self.ops, self.values, self.old_values):
+                yield EditAction(types[code], value, old)
+    
+    def to_script(self) -> EditScript:
+        return list(self)
+    
+    def count(self, code: int) -> int:
+        return self.ops.count(code)
+    
+    @classmethod
+    def from_script(cls, script: EditScript) -> 'PackedScript':
+        codes = OP_CODES
+        ops = bytearray(codes[action.op] for action in script)
+        values = [action.value for action in script]
+        old_values = None
+        if OP_REPLACE in ops:
+            old_values = [action.old_value for action in script]
+        return cls(ops, values, old_values)
+
+
 @dataclass
 class DiffResult:
     script: EditScript
@@ -35,8 +86,8 @@ class DiffResult:
     
     @classmethod
     def from_script(cls, script: EditScript, orig_len: int, mod_len: int) -> 'DiffResult':
-        edit_dist = sum(1 for a in script if a.op != OpType.EQUAL)
-        lcs_len = sum(1 for a in script if a.op == OpType.EQUAL)
+        lcs_len = [action.op for action in script].count(OpType.EQUAL)
+        edit_dist = len(script) - lcs_len
         total = orig_len + mod_len
         sim_ratio = (2.0 * lcs_len / total) if total > 0 else 1.0
         return cls(
@@ -82,6 +133,37 @@ def make_replace(new_value: T, old_value: T) -> EditAction:
     return EditAction(OpType.REPLACE, new_value, old_value)
 
 
+def intern_sequence(seq: List[T], table: Dict[object, int]) -> List[int]:
+    setdefault = table.setdefault
+    return [setdefault(item, len(table)) for item in seq]
+
+
+def intern_pair(a: List[T], b: List[T]) -> Optional[Tuple[List[int], List[int]]]:
+    table: Dict[object, int] = {}
+    try:
+        return intern_sequence(a, table), intern_sequence(b, table)
+    except TypeError:
+        return None
+
+
+def common_prefix_length(a: List[T], b: List[T]) -> int:
+    limit = min(len(a), len(b))
+    i = 0
+    while i < limit and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def common_suffix_length(a: List[T], b: List[T], prefix: int = 0) -> int:
+    limit = min(len(a), len(b)) - prefix
+    last_a = len(a) - 1
+    last_b = len(b) - 1
+    i = 0
+    while i < limit and a[last_a - i] == b[last_b - i]:
+        i += 1
+    return i
+
+
 def script_to_tuples(script: EditScript) -> List[Tuple[str, object]]:
     return [(action.op.value, action.value) for action in script]
 
@@ -94,24 +176,31 @@ def tuples_to_script(tuples: List[Tuple[str, object]]) -> EditScript:
     return result
 
 
+def pack_ops(script: EditScript) -> bytes:
+    if isinstance(script, PackedScript):
+        return bytes(script.ops)
+    return bytes(map(OP_CODES.__getitem__, map(attrgetter('op'), script)))
+
+
+def op_value_pairs(script: EditScript) -> Iterator[Tuple[OpType, object]]:
+    if isinstance(script, PackedScript):
+        return zip(map(OP_TYPES.__getitem__, script.ops), script.values)
+    return map(itemgetter(0, 1), script)
+
+
 def count_operations(script: EditScript) -> dict:
-    counts = {
-        'inserts': 0,
-        'deletes': 0,
-        'equals': 0,
-        'replaces': 0,
-        'total': len(script)
+    if isinstance(script, PackedScript):
+        ops, kinds = script.ops, range(len(OP_TYPES))
+    else:
+        ops, kinds = [action.op for action in script], OP_TYPES
+    inserts, deletes, equals, replaces = map(ops.count, kinds)
+    return {
+        'inserts': inserts,
+        'deletes': deletes,
+        'equals': equals,
+        'replaces': replaces,
+        'total': len(ops)
     }
-    for action in script:
-        if action.op == OpType.INSERT:
-            counts['inserts'] += 1
-        elif action.op == OpType.DELETE:
-            counts['deletes'] += 1
-        elif action.op == OpType.EQUAL:
-            counts['equals'] += 1
-        elif action.op == OpType.REPLACE:
-            counts['replaces'] += 1
-    return counts
 
 
 def tokenize_lines(text: str) -> List[str]:
@@ -124,9 +213,7 @@ def tokenize_lines(text: str) -> List[str]:
 def tokenize_words(text: str) -> List[str]:
     if not text:
         return []
-    import re
-    tokens = re.findall(r'\S+|\s+', text)
-    return tokens
+    return _WORD_RE.findall(text)
 
 
 def tokenize_chars(text: str) -> List[str]:
@@ -152,29 +239,14 @@ def join_tokens(tokens: List[str], token_type: TokenType) -> str:
 
 
 def group_consecutive_ops(script: EditScript) -> List[Tuple[OpType, List[object]]]:
-    if not script:
-        return []
-    groups = []
-    current_op = script[0].op
-    current_values = [script[0].value]
-    for action in script[1:]:
-        if action.op == current_op:
-            current_values.append(action.value)
-        else:
-            groups.append((current_op, current_values))
-            current_op = action.op
-            current_values = [action.value]
-    groups.append((current_op, current_values))
-    return groups
+    return [(op, [action.value for action in group]) for op, group in groupby(script, key=itemgetter(0))]
 
 
 def split_into_hunks(script: EditScript, context: int = 3) -> List[List[EditAction]]:
     if not script:
         return []
-    change_indices = []
-    for i, action in enumerate(script):
-        if action.op != OpType.EQUAL:
-            change_indices.append(i)
+    equal = OpType.EQUAL
+    change_indices = [i for i, action in enumerate(script) if action.op is not equal]
     if not change_indices:
         return []
     hunks = []
@@ -193,22 +265,21 @@ def split_into_hunks(script: EditScript, context: int = 3) -> List[List[EditActi
 
 
 def calculate_line_numbers(script: EditScript) -> List[Tuple[Optional[int], Optional[int]]]:
+    insert, delete = OpType.INSERT, OpType.DELETE
     result = []
+    append = result.append
     orig_line = 1
     mod_line = 1
     for action in script:
-        if action.op == OpType.EQUAL:
-            result.append((orig_line, mod_line))
-            orig_line += 1
-            mod_line += 1
-        elif action.op == OpType.DELETE:
-            result.append((orig_line, None))
+        op = action.op
+        if op is delete:
+            append((orig_line, None))
             orig_line += 1
-        elif action.op == OpType.INSERT:
-            result.append((None, mod_line))
+        elif op is insert:
+            append((None, mod_line))
             mod_line += 1
-        elif action.op == OpType.REPLACE:
-            result.append((orig_line, mod_line))
+        else:
+            append((orig_line, mod_line))
             orig_line += 1
             mod_line += 1
     return result
@@ -1,10 +1,132 @@
-import argparse
+import hashlib
+import io
+from collections import OrderedDict
+from itertools import accumulate
 import sys
 import os
-from typing import Optional, List, TextIO
+import stat
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Optional, List, TextIO, Tuple, Callable, Union
+
+if TYPE_CHECKING:
+    import argparse
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from algorithms.utils import OpType, OP_INSERT, OP_DELETE, OP_EQUAL, OP_REPLACE, CHANGE_RUN, pack_ops
+
+
+_ORIG_STEP = bytes.maketrans(bytes([OP_INSERT, OP_DELETE, OP_EQUAL, OP_REPLACE]), bytes([0, 1, 1, 0]))
+_MOD_STEP = bytes.maketrans(bytes([OP_INSERT, OP_DELETE, OP_EQUAL, OP_REPLACE]), bytes([1, 0, 1, 0]))
+
+_HTML_HEADER = '''<!DOCTYPE html>
+<html><head><meta charset="UTF-8">
+<title>Diff: %s vs %s</title>
+<style>
+body { font-family: monospace; margin: 20px; }
+.diff-container { border: 1px solid #ddd; border-radius: 4px; }
+.diff-header { background: #f7f7f7; padding: 10px; border-bottom: 1px solid #ddd; }
+table { width: 100%%; border-collapse: collapse; }
+td { padding: 2px 8px; vertical-align: top; white-space: pre-wrap; }
+.line-num { width: 50px; text-align: right; color: #999; background: #f7f7f7; }
+.equal { background: #fff; }
+.delete { background: #ffeef0; }
+.insert { background: #e6ffed; }
+.marker { width: 20px; text-align: center; font-weight: bold; }
+.marker-del { color: #cb2431; }
+.marker-ins { color: #22863a; }
+</style></head><body>
+<div class="diff-container">
+<div class="diff-header"><b>--- %s</b><br><b>+++ %s</b></div>
+<table>
+'''
+
+_HTML_ROW_EQUAL = (
+    '<tr class="equal"><td class="line-num">%d</td>\n'
+    '<td class="marker"> </td><td class="line-num">%d</td>\n'
+    '<td>%s</td></tr>\n'
+)
+
+_HTML_ROW_DELETE = (
+    '<tr class="delete"><td class="line-num">%d</td>\n'
+    '<td class="marker marker-del">-</td><td class="line-num"></td>\n'
+    '<td>%s</td></tr>\n'
+)
+
+_HTML_ROW_INSERT = (
+    '<tr class="insert"><td class="line-num"></td>\n'
+    '<td class="marker marker-ins">+</td><td class="line-num">%d</td>\n'
+    '<td>%s</td></tr>\n'
+)
+
+_HTML_FOOTER = '</table></div></body></html>\n'
+
+_HTML_FLUSH_SIZE = 65536
+
+_SIDE_BY_SIDE_BATCH = 4096
+
+
+_FAST_FLAGS = {
+    '-u': 'unified', '--unified': 'unified',
+    '-y': 'side_by_side', '--side-by-side': 'side_by_side',
+    '--html': 'html',
+    '-s': 'simple', '--simple': 'simple',
+    '-r': 'recursive', '--recursive': 'recursive',
+    '-q': 'quiet', '--quiet': 'quiet',
+    '--no-color': 'no_color',
+    '--ignore-whitespace': 'ignore_whitespace',
+    '--ignore-case': 'ignore_case',
+}
+
+_FORMAT_FLAGS = frozenset(('unified', 'side_by_side', 'html', 'simple'))
+
+_FAST_DEFAULTS = {
+    'unified': True, 'side_by_side': False, 'html': False, 'simple': False,
+    'context': 3, 'width': 130, 'recursive': False, 'quiet': False,
+    'no_color': False, 'output': None, 'ignore_whitespace': False, 'ignore_case': False,
+}
+
+
+CLI_CACHE_SIZE = 512
+
+
+class _LRUCache(OrderedDict):
+    def __init__(self, maxsize: int = CLI_CACHE_SIZE):
+        super().__init__()
+        self.maxsize = maxsize
+        
+    def lookup(self, key):
+        value = self.get(key)
+        if value is not None:
+            self.move_to_end(key)
+        return value
+        
+    def store(self, key, value):
+        self[key] = value
+        if len(self) > self.maxsize:
+            self.popitem(last=False)
+        return value
+
+
+def _lines_digest(lines: List[str]) -> Tuple[int, bytes]:
+    data = '\n'.join(lines).encode('utf-8', 'surrogatepass')
+    return (len(lines), hashlib.blake2b(data, digest_size=16).digest())
+
+
+def _strip_lower(line: str) -> str:
+    return line.strip().lower()
+
+
+def _line_normalizer(ignore_whitespace: bool, ignore_case: bool) -> Optional[Callable[[str], str]]:
+    if ignore_whitespace and ignore_case:
+        return _strip_lower
+    if ignore_whitespace:
+        return str.strip
+    if ignore_case:
+        return str.lower
+    return None
+
+
 class ANSIColors:
     RESET = '\033[0m'
     BOLD = '\033[1m'
@@ -18,56 +140,79 @@ class ANSIColors:
     WHITE = '\033[37m'
     BG_RED = '\033[41m'
     BG_GREEN = '\033[42m'
-    
-    @classmethod
-    def disable(cls):
-        cls.RESET = ''
-        cls.BOLD = ''
-        cls.DIM = ''
-        cls.RED = ''
-        cls.GREEN = ''
-        cls.YELLOW = ''
-        cls.BLUE = ''
-        cls.MAGENTA = ''
-        cls.CYAN = ''
-        cls.WHITE = ''
-        cls.BG_RED = ''
-        cls.BG_GREEN = ''
+
+
+class _NoColors:
+    RESET = ''
+    BOLD = ''
+    DIM = ''
+    RED = ''
+    GREEN = ''
+    YELLOW = ''
+    BLUE = ''
+    MAGENTA = ''
+    CYAN = ''
+    WHITE = ''
+    BG_RED = ''
+    BG_GREEN = ''
 
 
 class ColorPrinter:
-    def __init__(self, use_color: bool = True, output: TextIO = sys.stdout):
+    def __init__(self, use_color: bool = True, output: Optional[TextIO] = None):
+        if output is None:
+            output = sys.stdout
         self.use_color = use_color
         self.output = output
-        if not use_color:
-            ANSIColors.disable()
-            
+        palette = ANSIColors if use_color else _NoColors
+        self.RESET = palette.RESET
+        self.BOLD = palette.BOLD
+        self.DIM = palette.DIM
+        self.RED = palette.RED
+        self.GREEN = palette.GREEN
+        self.YELLOW = palette.YELLOW
+        self.BLUE = palette.BLUE
+        self.MAGENTA = palette.MAGENTA
+        self.CYAN = palette.CYAN
+        self.WHITE = palette.WHITE
+        self.BG_RED = palette.BG_RED
+        self.BG_GREEN = palette.BG_GREEN
+        reset_line = self.RESET + '\n'
+        self._added = (self.GREEN + '+', reset_line)
+        self._removed = (self.RED + '-', reset_line)
+        self._header = (self.BOLD, reset_line)
+        self._hunk_header = (self.CYAN, reset_line)
+        self.write = output.write
+        
     def print(self, text: str, end: str = '\n'):
-        self.output.write(text + end)
+        self.write(text + end)
         
     def print_added(self, text: str):
-        self.print(f"{ANSIColors.GREEN}+{text}{ANSIColors.RESET}")
+        prefix, suffix = self._added
+        self.write(prefix + text + suffix)
         
     def print_removed(self, text: str):
-        self.print(f"{ANSIColors.RED}-{text}{ANSIColors.RESET}")
+        prefix, suffix = self._removed
+        self.write(prefix + text + suffix)
         
     def print_context(self, text: str):
-        self.print(f" {text}")
+        self.write(' ' + text + '\n')
         
     def print_header(self, text: str):
-        self.print(f"{ANSIColors.BOLD}{text}{ANSIColors.RESET}")
+        prefix, suffix = self._header
+        self.write(prefix + text + suffix)
         
     def print_hunk_header(self, text: str):
-        self.print(f"{ANSIColors.CYAN}{text}{ANSIColors.RESET}")
+        prefix, suffix = self._hunk_header
+        self.write(prefix + text + suffix)
         
     def print_error(self, text: str):
-        sys.stderr.write(f"{ANSIColors.RED}Error: {text}{ANSIColors.RESET}\n")
+        sys.stderr.write(f"{self.RED}Error: {text}{self.RESET}\n")
         
     def print_warning(self, text: str):
-        sys.stderr.write(f"{ANSIColors.YELLOW}Warning: {text}{ANSIColors.RESET}\n")
+        sys.stderr.write(f"{self.YELLOW}Warning: {text}{self.RESET}\n")
         
     def print_info(self, text: str):
-        sys.stderr.write(f"{ANSIColors.BLUE}{text}{ANSIColors.RESET}\n")
+        sys.stderr.write(f"{self.BLUE}{text}{self.RESET}\n")
 
 
 class DiffOutputFormatter:
@@ -75,93 +220,147 @@ class DiffOutputFormatter:
         self.printer = printer
         self.context_lines = context_lines
         
-    def format_unified(self, script, file1: str, file2: str, lines1: List[str], lines2: List[str]):
-        from algorithms.utils import OpType
-        has_changes = any(action.op != OpType.EQUAL for action in script)
-        if not has_changes:
+    def format_unified(self, script, file1: str, file2: str, lines1: List[str], lines2: List[str],
+                       codes: Optional[bytes] = None):
+        if codes is None:
+            codes = pack_ops(script)
+        hunks = self._generate_hunks(script, codes)
+        if not hunks:
             return
         self.printer.print_header(f"--- {file1}")
         self.printer.print_header(f"+++ {file2}")
-        hunks = self._generate_hunks(script)
+        orig_cum = list(accumulate(codes.translate(_ORIG_STEP), initial=0))
+        mod_cum = list(accumulate(codes.translate(_MOD_STEP), initial=0))
         for hunk in hunks:
-            self._print_hunk(hunk, script)
+            self._print_hunk(hunk, script, orig_cum, mod_cum)
             
-    def _generate_hunks(self, script) -> List[dict]:
-        from algorithms.utils import OpType
+    def _generate_hunks(self, script, codes: Optional[bytes] = None) -> List[dict]:
         if not script:
             return []
-        change_indices = []
-        for i, action in enumerate(script):
-            if action.op != OpType.EQUAL:
-                change_indices.append(i)
-        if not change_indices:
-            return []
+        if codes is None:
+            codes = pack_ops(script)
+        last = len(script) - 1
+        context = self.context_lines
         hunks = []
-        current_start = max(0, change_indices[0] - self.context_lines)
-        current_end = min(len(script) - 1, change_indices[0] + self.context_lines)
-        for idx in change_indices[1:]:
-            potential_start = max(0, idx - self.context_lines)
-            if potential_start <= current_end + 1:
-                current_end = min(len(script) - 1, idx + self.context_lines)
-            else:
+        current_start = current_end = None
+        for run in CHANGE_RUN.finditer(codes):
+            potential_start = max(0, run.start() - context)
+            run_end = min(last, run.end() - 1 + context)
+            if current_end is None:
+                current_start = potential_start
+            elif potential_start > current_end + 1:
                 hunks.append({'start': current_start, 'end': current_end})
                 current_start = potential_start
-                current_end = min(len(script) - 1, idx + self.context_lines)
-        hunks.append({'start': current_start, 'end': current_end})
+            current_end = run_end
+        if current_end is not None:
+            hunks.append({'start': current_start, 'end': current_end})
         return hunks
     
-    def _print_hunk(self, hunk: dict, script):
-        from algorithms.utils import OpType
+    def _print_hunk(self, hunk: dict, script, orig_cum: List[int], mod_cum: List[int]):
         start = hunk['start']
         end = hunk['end']
-        orig_start = 0
-        mod_start = 0
-        for i in range(start):
-            if script[i].op == OpType.EQUAL:
-                orig_start += 1
-                mod_start += 1
-            elif script[i].op == OpType.DELETE:
-                orig_start += 1
-            elif script[i].op == OpType.INSERT:
-                mod_start += 1
-        orig_count = 0
-        mod_count = 0
-        for i in range(start, end + 1):
-            if script[i].op == OpType.EQUAL:
-                orig_count += 1
-                mod_count += 1
-            elif script[i].op == OpType.DELETE:
-                orig_count += 1
-            elif script[i].op == OpType.INSERT:
-                mod_count += 1
+        orig_start = orig_cum[start]
+        mod_start = mod_cum[start]
+        orig_count = orig_cum[end + 1] - orig_start
+        mod_count = mod_cum[end + 1] - mod_start
         header = f"@@ -{orig_start + 1},{orig_count} +{mod_start + 1},{mod_count} @@"
         self.printer.print_hunk_header(header)
-        for i in range(start, end + 1):
-            action = script[i]
-            if action.op == OpType.EQUAL:
-                self.printer.print_context(str(action.value))
-            elif action.op == OpType.DELETE:
-                self.printer.print_removed(str(action.value))
-            elif action.op == OpType.INSERT:
-                self.printer.print_added(str(action.value))
+        self._print_actions(script[start:end + 1])
+        
+    def _print_actions(self, actions):
+        EQUAL, DELETE, INSERT = OpType.EQUAL, OpType.DELETE, OpType.INSERT
+        print_context = self.printer.print_context
+        print_removed = self.printer.print_removed
+        print_added = self.printer.print_added
+        for action in actions:
+            op = action.op
+            if op is EQUAL:
+                print_context(str(action.value))
+            elif op is DELETE:
+                print_removed(str(action.value))
+            elif op is INSERT:
+                print_added(str(action.value))
 
     def format_simple(self, script, file1: str, file2: str):
-        from algorithms.utils import OpType
-        for action in script:
-            if action.op == OpType.EQUAL:
-                self.printer.print_context(str(action.value))
-            elif action.op == OpType.DELETE:
-                self.printer.print_removed(str(action.value))
-            elif action.op == OpType.INSERT:
-                self.printer.print_added(str(action.value))
+        self._print_actions(script)
 
 
 class CLIApplication:
     def __init__(self):
-        self.parser = self._create_parser()
+        self._parser: Optional['argparse.ArgumentParser'] = None
         self.printer: Optional[ColorPrinter] = None
+        self._binary_cache = _LRUCache()
+        self._lines_cache = _LRUCache()
+        self._diff_cache: Optional[_LRUCache] = None
         
-    def _create_parser(self) -> argparse.ArgumentParser:
+    @property
+    def parser(self) -> 'argparse.ArgumentParser':
+        if self._parser is None:
+            self._parser = self._create_parser()
+        return self._parser
+    
+    def _parse_args(self, argv: Optional[List[str]]) -> Union[SimpleNamespace, 'argparse.Namespace']:
+        args = sys.argv[1:] if argv is None else argv
+        if len(args) <= 4:
+            files = []
+            flags = []
+            for arg in args:
+                if not arg.startswith('-'):
+                    files.append(arg)
+                elif arg in _FAST_FLAGS:
+                    flags.append(_FAST_FLAGS[arg])
+                else:
+                    break
+            else:
+                formats = sum(1 for flag in flags if flag in _FORMAT_FLAGS)
+                if len(files) == 2 and formats <= 1:
+                    namespace = SimpleNamespace(file1=files[0], file2=files[1], **_FAST_DEFAULTS)
+                    for flag in flags:
+                        setattr(namespace, flag, True)
+                    return namespace
+        return self.parser.parse_args(argv)
+    
+    def _file_key(self, path: str, st: Optional[os.stat_result] = None) -> Tuple[str, int, int]:
+        if st is None:
+            st = os.stat(path)
+        return (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    
+    def _is_binary(self, path: str, key: Optional[Tuple[str, int, int]] = None) -> bool:
+        from fs.binary_check import is_binary_file
+        if key is None:
+            key = self._file_key(path)
+        result = self._binary_cache.lookup(key)
+        if result is None:
+            result = self._binary_cache.store(key, is_binary_file(path))
+        return result
+    
+    def _read_lines(self, path: str, key: Optional[Tuple[str, int, int]] = None) -> List[str]:
+        from fs.walker import read_file_lines
+        if key is None:
+            key = self._file_key(path)
+        lines = self._lines_cache.lookup(key)
+        if lines is None:
+            lines = self._lines_cache.store(key, read_file_lines(path))
+        return lines
+    
+    def _diff_lines(self, lines1: List[str], lines2: List[str],
+                    normalize: Optional[Callable[[str], str]] = None) -> Tuple[list, bytes, int]:
+        from algorithms.myers import diff
+        cache = self._diff_cache
+        if cache is None:
+            script = diff(lines1, lines2, normalize)
+            codes = pack_ops(script)
+            return script, codes, len(codes) - codes.count(OP_EQUAL)
+        key = (_lines_digest(lines1), _lines_digest(lines2), normalize)
+        entry = cache.lookup(key)
+        if entry is None:
+            script = diff(lines1, lines2, normalize)
+            codes = pack_ops(script)
+            entry = cache.store(key, (script, codes, len(codes) - codes.count(OP_EQUAL)))
+        return entry
+        
+    def _create_parser(self) -> 'argparse.ArgumentParser':
+        import argparse
         parser = argparse.ArgumentParser(
             prog='myers-diff',
             description='Compare files using Myers diff algorithm',
@@ -252,7 +451,7 @@ Examples:
         return parser
     
     def run(self, argv: Optional[List[str]] = None) -> int:
-        args = self.parser.parse_args(argv)
+        args = self._parse_args(argv)
         use_color = not args.no_color and sys.stdout.isatty()
         if args.output:
             output_file = open(args.output, 'w', encoding='utf-8')
@@ -275,52 +474,53 @@ Examples:
     def _execute(self, args) -> int:
         file1 = args.file1
         file2 = args.file2
-        if not os.path.exists(file1):
+        try:
+            st1 = os.stat(file1)
+        except (OSError, ValueError):
             self.printer.print_error(f"File not found: {file1}")
             return 2
-        if not os.path.exists(file2):
+        try:
+            st2 = os.stat(file2)
+        except (OSError, ValueError):
             self.printer.print_error(f"File not found: {file2}")
             return 2
-        if args.recursive and os.path.isdir(file1) and os.path.isdir(file2):
+        is_dir1 = stat.S_ISDIR(st1.st_mode)
+        is_dir2 = stat.S_ISDIR(st2.st_mode)
+        if args.recursive and is_dir1 and is_dir2:
             return self._compare_directories(args, file1, file2)
-        if os.path.isdir(file1) or os.path.isdir(file2):
+        if is_dir1 or is_dir2:
             self.printer.print_error("Cannot compare directory with file. Use -r for directories.")
             return 2
-        return self._compare_files(args, file1, file2)
+        return self._compare_files(args, file1, file2, st1, st2)
     
-    def _compare_files(self, args, file1: str, file2: str) -> int:
-        from fs.binary_check import is_binary_file
-        from fs.walker import read_file_lines
-        from algorithms.myers import diff
-        from algorithms.utils import OpType
+    def _compare_files(self, args, file1: str, file2: str,
+                       st1: Optional[os.stat_result] = None,
+                       st2: Optional[os.stat_result] = None) -> int:
         try:
-            if is_binary_file(file1):
+            key1 = self._file_key(file1, st1)
+            if self._is_binary(file1, key1):
                 self.printer.print_error(f"Binary file: {file1}")
                 return 2
-            if is_binary_file(file2):
+            key2 = self._file_key(file2, st2)
+            if self._is_binary(file2, key2):
                 self.printer.print_error(f"Binary file: {file2}")
                 return 2
         except Exception as e:
             self.printer.print_error(f"Error checking files: {e}")
             return 2
         try:
-            lines1 = read_file_lines(file1)
-            lines2 = read_file_lines(file2)
+            lines1 = self._read_lines(file1, key1)
+            lines2 = self._read_lines(file2, key2)
         except Exception as e:
             self.printer.print_error(f"Error reading files: {e}")
             return 2
-        if args.ignore_whitespace:
-            lines1 = [line.strip() for line in lines1]
-            lines2 = [line.strip() for line in lines2]
-        if args.ignore_case:
-            lines1 = [line.lower() for line in lines1]
-            lines2 = [line.lower() for line in lines2]
+        normalize = _line_normalizer(args.ignore_whitespace, args.ignore_case)
         try:
-            script = diff(lines1, lines2)
+            script, codes, change_count = self._diff_lines(lines1, lines2, normalize)
         except Exception as e:
             self.printer.print_error(f"Error computing diff: {e}")
             return 2
-        has_changes = any(action.op != OpType.EQUAL for action in script)
+        has_changes = change_count > 0
         if args.quiet:
             if has_changes:
                 self.printer.print(f"Files {file1} and {file2} differ")
@@ -335,11 +535,13 @@ Examples:
         elif args.simple:
             formatter.format_simple(script, file1, file2)
         else:
-            formatter.format_unified(script, file1, file2, lines1, lines2)
+            formatter.format_unified(script, file1, file2, lines1, lines2, codes)
         return 1 if has_changes else 0
     
     def _compare_directories(self, args, dir1: str, dir2: str) -> int:
         from fs.walker import DirectoryComparator
+        if self._diff_cache is None:
+            self._diff_cache = _LRUCache()
         comparator = DirectoryComparator(dir1, dir2)
         result = comparator.compare()
         has_changes = bool(result['only_in_first'] or result['only_in_second'] or result['modified'])
@@ -356,7 +558,7 @@ Examples:
         if result['modified']:
             self.printer.print_header("Modified files:")
             for f in result['modified']:
-                self.printer.print(f"  {ANSIColors.YELLOW}{f}{ANSIColors.RESET}")
+                self.printer.print(f"  {self.printer.YELLOW}{f}{self.printer.RESET}")
                 if not args.quiet:
                     f1 = os.path.join(dir1, f)
                     f2 = os.path.join(dir2, f)
@@ -364,88 +566,72 @@ Examples:
         return 1 if has_changes else 0
     
     def _format_side_by_side(self, script, file1: str, file2: str, width: int):
-        from algorithms.utils import OpType
+        EQUAL, DELETE, INSERT = OpType.EQUAL, OpType.DELETE, OpType.INSERT
         col_width = (width - 3) // 2
         self.printer.print(f"{'=' * width}")
         self.printer.print(f"{file1:<{col_width}} | {file2}")
         self.printer.print(f"{'=' * width}")
-        i = 0
-        while i < len(script):
-            action = script[i]
-            if action.op == OpType.EQUAL:
-                left = str(action.value)[:col_width]
-                right = str(action.value)[:col_width]
-                self.printer.print(f"{left:<{col_width}} | {right}")
-                i += 1
-            elif action.op == OpType.DELETE:
-                if i + 1 < len(script) and script[i + 1].op == OpType.INSERT:
-                    left = str(action.value)[:col_width]
-                    right = str(script[i + 1].value)[:col_width]
-                    line = f"{ANSIColors.RED}{left:<{col_width}}{ANSIColors.RESET} < {ANSIColors.GREEN}{right}{ANSIColors.RESET}"
-                    self.printer.print(line)
-                    i += 2
+        red, green, reset = self.printer.RED, self.printer.GREEN, self.printer.RESET
+        cell = f"%-{col_width}.{col_width}s"
+        tpl_equal = f"{cell} | %.{col_width}s\n"
+        tpl_replace = f"{red}{cell}{reset} < {green}%.{col_width}s{reset}\n"
+        tpl_delete = f"{red}{cell}{reset} <\n"
+        tpl_insert = f"{' ' * col_width} > {green}%.{col_width}s{reset}\n"
+        output_write = self.printer.write
+        rows: List[str] = []
+        write = rows.append
+        actions = iter(script)
+        action = next(actions, None)
+        while action is not None:
+            following = next(actions, None)
+            op = action.op
+            if op is EQUAL:
+                write(tpl_equal % (action.value, action.value))
+            elif op is DELETE:
+                if following is not None and following.op is INSERT:
+                    write(tpl_replace % (action.value, following.value))
+                    following = next(actions, None)
                 else:
-                    left = str(action.value)[:col_width]
-                    line = f"{ANSIColors.RED}{left:<{col_width}}{ANSIColors.RESET} <"
-                    self.printer.print(line)
-                    i += 1
-            elif action.op == OpType.INSERT:
-                right = str(action.value)[:col_width]
-                line = f"{'':<{col_width}} > {ANSIColors.GREEN}{right}{ANSIColors.RESET}"
-                self.printer.print(line)
-                i += 1
-            else:
-                i += 1
+                    write(tpl_delete % (action.value,))
+            elif op is INSERT:
+                write(tpl_insert % (action.value,))
+            if len(rows) >= _SIDE_BY_SIDE_BATCH:
+                output_write(''.join(rows))
+                rows.clear()
+            action = following
+        if rows:
+            output_write(''.join(rows))
     
     def _format_html(self, script, file1: str, file2: str, lines1: List[str], lines2: List[str]):
-        from algorithms.utils import OpType
         from html import escape
-        html_parts = []
-        html_parts.append('<!DOCTYPE html>')
-        html_parts.append('<html><head><meta charset="UTF-8">')
-        html_parts.append(f'<title>Diff: {escape(file1)} vs {escape(file2)}</title>')
-        html_parts.append('<style>')
-        html_parts.append('body { font-family: monospace; margin: 20px; }')
-        html_parts.append('.diff-container { border: 1px solid #ddd; border-radius: 4px; }')
-        html_parts.append('.diff-header { background: #f7f7f7; padding: 10px; border-bottom: 1px solid #ddd; }')
-        html_parts.append('table { width: 100%; border-collapse: collapse; }')
-        html_parts.append('td { padding: 2px 8px; vertical-align: top; white-space: pre-wrap; }')
-        html_parts.append('.line-num { width: 50px; text-align: right; color: #999; background: #f7f7f7; }')
-        html_parts.append('.equal { background: #fff; }')
-        html_parts.append('.delete { background: #ffeef0; }')
-        html_parts.append('.insert { background: #e6ffed; }')
-        html_parts.append('.marker { width: 20px; text-align: center; font-weight: bold; }')
-        html_parts.append('.marker-del { color: #cb2431; }')
-        html_parts.append('.marker-ins { color: #22863a; }')
-        html_parts.append('</style></head><body>')
-        html_parts.append('<div class="diff-container">')
-        html_parts.append(f'<div class="diff-header"><b>--- {escape(file1)}</b><br><b>+++ {escape(file2)}</b></div>')
-        html_parts.append('<table>')
+        name1 = escape(file1)
+        name2 = escape(file2)
+        output_write = self.printer.write
+        buf = io.StringIO()
+        write = buf.write
+        write(_HTML_HEADER % (name1, name2, name1, name2))
+        EQUAL, DELETE, INSERT = OpType.EQUAL, OpType.DELETE, OpType.INSERT
         orig_line = 1
         mod_line = 1
         for action in script:
-            if action.op == OpType.EQUAL:
-                content = escape(str(action.value))
-                html_parts.append(f'<tr class="equal"><td class="line-num">{orig_line}</td>')
-                html_parts.append(f'<td class="marker"> </td><td class="line-num">{mod_line}</td>')
-                html_parts.append(f'<td>{content}</td></tr>')
+            if action.op is EQUAL:
+                write(_HTML_ROW_EQUAL % (orig_line, mod_line, escape(str(action.value))))
                 orig_line += 1
                 mod_line += 1
-            elif action.op == OpType.DELETE:
-                content = escape(str(action.value))
-                html_parts.append(f'<tr class="delete"><td class="line-num">{orig_line}</td>')
-                html_parts.append(f'<td class="marker marker-del">-</td><td class="line-num"></td>')
-                html_parts.append(f'<td>{content}</td></tr>')
+            elif action.op is DELETE:
+                write(_HTML_ROW_DELETE % (orig_line, escape(str(action.value))))
                 orig_line += 1
-            elif action.op == OpType.INSERT:
-                content = escape(str(action.value))
-                html_parts.append(f'<tr class="insert"><td class="line-num"></td>')
-                html_parts.append(f'<td class="marker marker-ins">+</td><td class="line-num">{mod_line}</td>')
-                html_parts.append(f'<td>{content}</td></tr>')
+            elif action.op is INSERT:
+                write(_HTML_ROW_INSERT % (mod_line, escape(str(action.value))))
                 mod_line += 1
-        html_parts.append('</table></div></body></html>')
-        self.printer.print('\n'.join(html_parts))
-
+            else:
+                continue
+            if buf.tell() >= _HTML_FLUSH_SIZE:
+                output_write(buf.getvalue())
+                buf.seek(0)
+                buf.truncate()
+        write(_HTML_FOOTER)
+        output_write(buf.getvalue())
 
 def main(argv: Optional[List[str]] = None) -> int:
     app = CLIApplication()
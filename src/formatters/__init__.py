@@ -1,14 +1,36 @@
-from formatters.base import (
+from importlib import import_module
+import sys
+import os
+
+_SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _SRC_DIR not in sys.path:
+    sys.path.insert(0, _SRC_DIR)
+
+from .base import (
     BaseFormatter, SimpleFormatter, FormatterConfig, FormatterFactory,
     ColorScheme, OutputWriter, OutputTarget, DiffHunk, HunkGenerator
 )
-from formatters.unified import UnifiedFormatter, ContextDiffFormatter, NormalDiffFormatter
-from formatters.side_by_side import (
-    SideBySideFormatter, SideBySideRow, SideBySideGenerator, SideBySideRowFormatter,
-    SideBySideHeader, ColumnConfig, TextTruncator, LineNumberFormatter, GutterFormatter,
-    CompactSideBySideFormatter, WordDiffFormatter, InlineDiffFormatter
-)
-from formatters.html import HTMLFormatter, SideBySideHTMLFormatter, JSONFormatter
+
+
+_LAZY_ATTRS = {
+    "UnifiedFormatter": "unified", "ContextDiffFormatter": "unified", "NormalDiffFormatter": "unified",
+    "SideBySideFormatter": "side_by_side", "SideBySideRow": "side_by_side",
+    "SideBySideGenerator": "side_by_side", "SideBySideRowFormatter": "side_by_side",
+    "SideBySideHeader": "side_by_side", "ColumnConfig": "side_by_side", "TextTruncator": "side_by_side",
+    "LineNumberFormatter": "side_by_side", "GutterFormatter": "side_by_side",
+    "CompactSideBySideFormatter": "side_by_side", "WordDiffFormatter": "side_by_side",
+    "InlineDiffFormatter": "side_by_side",
+    "HTMLFormatter": "html", "SideBySideHTMLFormatter": "html", "JSONFormatter": "html",
+}
+
+_LAZY_FORMATTERS = {
+    "unified": "unified", "context": "unified", "normal": "unified",
+    "side-by-side": "side_by_side", "compact": "side_by_side", "word": "side_by_side", "inline": "side_by_side",
+    "html": "html", "html-side-by-side": "html", "json": "html",
+}
+
+for _name, _module in _LAZY_FORMATTERS.items():
+    FormatterFactory.register_lazy(_name, f"{__name__}.{_module}")
 
 
 __all__ = [
@@ -22,6 +44,19 @@ __all__ = [
 ]
 
 
+def __getattr__(name: str):
+    module = _LAZY_ATTRS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f"{__name__}.{module}"), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
+
+
 def create_formatter(name: str, config: FormatterConfig = None) -> BaseFormatter:
     return FormatterFactory.create(name, config)
 
@@ -1,12 +1,12 @@
 from abc import ABC, abstractmethod
-from typing import List, TextIO, Optional, Any, Dict, Tuple
+from typing import List, TextIO, Optional, Any, Dict, Tuple, Union
 from enum import Enum
+from importlib import import_module
+import io
 import sys
-import os
 
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-from algorithms.utils import OpType, EditAction
+from algorithms.utils import (OpType, EditAction, OP_INSERT, OP_DELETE, OP_REPLACE, CHANGE_RUN,
+                             pack_ops, PackedScript, op_value_pairs)
 
 
 class OutputTarget(Enum):
@@ -16,6 +16,9 @@ class OutputTarget(Enum):
 
 
 class FormatterConfig:
+    __slots__ = ('context_lines', 'width', 'use_color', 'tab_size', 'show_line_numbers',
+                 'ignore_whitespace', 'ignore_case', 'encoding')
+    
     def __init__(
         self,
         context_lines: int = 3,
@@ -65,6 +68,9 @@ class FormatterConfig:
 
 
 class ColorScheme:
+    __slots__ = ('reset', 'bold', 'dim', 'red', 'green', 'yellow', 'blue', 'magenta', 'cyan',
+                 'white', 'bg_red', 'bg_green', 'bg_yellow')
+    
     def __init__(self):
         self.reset = '\033[0m'
         self.bold = '\033[1m'
@@ -102,30 +108,78 @@ class ColorScheme:
         return scheme
 
 
+FILE_BUFFER_SIZE = 131072
+ROW_BATCH = 4096
+
+
 class OutputWriter:
     def __init__(self, target: OutputTarget = OutputTarget.STDOUT, output: Optional[TextIO] = None):
         self.target = target
         self._output = output or sys.stdout
-        self._buffer: List[str] = []
+        self._buf = io.StringIO()
         
     def write(self, text: str):
         if self.target == OutputTarget.STRING:
-            self._buffer.append(text)
+            self._buf.write(text)
+        elif self.target == OutputTarget.FILE:
+            self._buf.write(text)
+            if self._buf.tell() >= FILE_BUFFER_SIZE:
+                self._drain()
         else:
             self._output.write(text)
             
     def writeln(self, text: str = ""):
-        self.write(text + "\n")
+        if self.target == OutputTarget.STDOUT:
+            self._output.write(text)
+            self._output.write("\n")
+            return
+        buf = self._buf
+        buf.write(text)
+        buf.write("\n")
+        if self.target == OutputTarget.FILE and buf.tell() >= FILE_BUFFER_SIZE:
+            self._drain()
         
     def get_output(self) -> str:
-        return "".join(self._buffer)
+        if self.target != OutputTarget.STRING:
+            return ""
+        return self._buf.getvalue()
+        
+    def _drain(self):
+        if self._buf.tell():
+            self._output.write(self._buf.getvalue())
+            self._buf.seek(0)
+            self._buf.truncate()
         
     def flush(self):
         if self.target != OutputTarget.STRING:
+            self._drain()
             self._output.flush()
 
 
+
+_INSERT_CODE = bytes([OP_INSERT])
+_DELETE_CODE = bytes([OP_DELETE])
+_REPLACE_CODE = bytes([OP_REPLACE])
+
+
+def _line_steps(codes: bytes, start: int, end: int) -> Tuple[int, int]:
+    span = end - start
+    replaces = codes.count(_REPLACE_CODE, start, end)
+    return (span - codes.count(_INSERT_CODE, start, end) - replaces,
+            span - codes.count(_DELETE_CODE, start, end) - replaces)
+
+
+def _script_slice(script: List[EditAction], start: int, stop: int) -> List[EditAction]:
+    if isinstance(script, PackedScript):
+        old_values = script.old_values
+        return PackedScript(script.ops[start:stop], script.values[start:stop],
+                            None if old_values is None else old_values[start:stop]).to_script()
+    return list(script[start:stop])
+
+
 class DiffHunk:
+    __slots__ = ('orig_start', 'orig_count', 'mod_start', 'mod_count', 'actions')
+    
     def __init__(
         self,
         orig_start: int,
@@ -147,7 +201,8 @@ class DiffHunk:
         return len(self.actions) == 0
         
     def has_changes(self) -> bool:
-        return any(a.op != OpType.EQUAL for a in self.actions)
+        EQUAL = OpType.EQUAL
+        return any(a.op is not EQUAL for a in self.actions)
 
 
 class HunkGenerator:
@@ -157,68 +212,37 @@ class HunkGenerator:
     def generate(self, script: List[EditAction]) -> List[DiffHunk]:
         if not script:
             return []
-        change_indices = self._find_change_indices(script)
-        if not change_indices:
-            return []
-        ranges = self._merge_ranges(change_indices, len(script))
-        hunks = []
-        for start, end in ranges:
-            hunk = self._create_hunk(script, start, end)
-            hunks.append(hunk)
+        codes = pack_ops(script)
+        context = self.context_lines
+        last = len(codes) - 1
+        hunks: List[DiffHunk] = []
+        orig_start = mod_start = position = 0
+        start, end = -1, -2
+        for run in CHANGE_RUN.finditer(codes):
+            run_start, run_end = run.span()
+            potential_start = max(0, run_start - context)
+            if potential_start > end + 1:
+                if start >= 0:
+                    orig_skip, mod_skip = _line_steps(codes, position, start)
+                    orig_start += orig_skip
+                    mod_start += mod_skip
+                    orig_count, mod_count = _line_steps(codes, start, end + 1)
+                    hunks.append(DiffHunk(orig_start, orig_count, mod_start, mod_count,
+                                          _script_slice(script, start, end + 1)))
+                    position = start
+                start = potential_start
+            end = min(last, run_end - 1 + context)
+        if start < 0:
+            return hunks
+        orig_skip, mod_skip = _line_steps(codes, position, start)
+        orig_count, mod_count = _line_steps(codes, start, end + 1)
+        hunks.append(DiffHunk(orig_start + orig_skip, orig_count, mod_start + mod_skip, mod_count,
+                              _script_slice(script, start, end + 1)))
         return hunks
-        
-    def _find_change_indices(self, script: List[EditAction]) -> List[int]:
-        indices = []
-        for i, action in enumerate(script):
-            if action.op != OpType.EQUAL:
-                indices.append(i)
-        return indices
-        
-    def _merge_ranges(self, change_indices: List[int], script_len: int) -> List[Tuple[int, int]]:
-        if not change_indices:
-            return []
-        ranges = []
-        current_start = max(0, change_indices[0] - self.context_lines)
-        current_end = min(script_len - 1, change_indices[0] + self.context_lines)
-        for idx in change_indices[1:]:
-            potential_start = max(0, idx - self.context_lines)
-            if potential_start <= current_end + 1:
-                current_end = min(script_len - 1, idx + self.context_lines)
-            else:
-                ranges.append((current_start, current_end))
-                current_start = potential_start
-                current_end = min(script_len - 1, idx + self.context_lines)
-        ranges.append((current_start, current_end))
-        return ranges
-        
-    def _create_hunk(self, script: List[EditAction], start: int, end: int) -> DiffHunk:
-        orig_start = 0
-        mod_start = 0
-        for i in range(start):
-            if script[i].op == OpType.EQUAL:
-                orig_start += 1
-                mod_start += 1
-            elif script[i].op == OpType.DELETE:
-                orig_start += 1
-            elif script[i].op == OpType.INSERT:
-                mod_start += 1
-        orig_count = 0
-        mod_count = 0
-        actions = []
-        for i in range(start, end + 1):
-            action = script[i]
-            actions.append(action)
-            if action.op == OpType.EQUAL:
-                orig_count += 1
-                mod_count += 1
-            elif action.op == OpType.DELETE:
-                orig_count += 1
-            elif action.op == OpType.INSERT:
-                mod_count += 1
-        return DiffHunk(orig_start, orig_count, mod_start, mod_count, actions)
-
 
 class BaseFormatter(ABC):
+    packed_input = False
+    
     def __init__(self, config: Optional[FormatterConfig] = None):
         self.config = config or FormatterConfig()
         self.colors = ColorScheme() if self.config.use_color else ColorScheme.no_color()
@@ -233,11 +257,17 @@ class BaseFormatter(ABC):
         lines2: Optional[List[str]] = None,
         output: Optional[TextIO] = None
     ) -> str:
+        if isinstance(script, PackedScript) and not self.packed_input:
+            script = script.to_script()
         if output is None:
             self.writer = OutputWriter(OutputTarget.STRING)
         else:
             self.writer = OutputWriter(OutputTarget.FILE, output)
-        self._format_impl(script, file1, file2, lines1, lines2)
+        try:
+            self._format_impl(script, file1, file2, lines1, lines2)
+        finally:
+            if output is not None:
+                self.writer.flush()
         if output is None:
             return self.writer.get_output()
         return ""
@@ -254,7 +284,8 @@ class BaseFormatter(ABC):
         pass
         
     def has_changes(self, script: List[EditAction]) -> bool:
-        return any(action.op != OpType.EQUAL for action in script)
+        EQUAL = OpType.EQUAL
+        return any(action.op is not EQUAL for action in script)
         
     def _write(self, text: str):
         if self.writer:
@@ -263,9 +294,16 @@ class BaseFormatter(ABC):
     def _writeln(self, text: str = ""):
         if self.writer:
             self.writer.writeln(text)
+            
+    def _writelines(self, lines: List[str]):
+        if self.writer and lines:
+            self.writer.write("\n".join(lines))
+            self.writer.write("\n")
 
 
 class SimpleFormatter(BaseFormatter):
+    packed_input = True
+    
     def _format_impl(
         self,
         script: List[EditAction],
@@ -274,32 +312,53 @@ class SimpleFormatter(BaseFormatter):
         lines1: Optional[List[str]],
         lines2: Optional[List[str]]
     ):
-        for action in script:
-            value = str(action.value)
-            if action.op == OpType.EQUAL:
-                self._writeln(f" {value}")
-            elif action.op == OpType.DELETE:
-                self._writeln(f"{self.colors.red}-{value}{self.colors.reset}")
-            elif action.op == OpType.INSERT:
-                self._writeln(f"{self.colors.green}+{value}{self.colors.reset}")
+        colors = self.colors
+        templates = {
+            OpType.EQUAL: " %s\n",
+            OpType.DELETE: f"{colors.red}-%s{colors.reset}\n",
+            OpType.INSERT: f"{colors.green}+%s{colors.reset}\n",
+        }
+        get_template = templates.get
+        parts: List[str] = []
+        append = parts.append
+        for op, value in op_value_pairs(script):
+            template = get_template(op)
+            if template is not None:
+                append(template % (value,))
+        if parts:
+            self._write("".join(parts))
 
 
 class FormatterFactory:
-    _formatters: Dict[str, type] = {}
+    _formatters: Dict[str, Union[type, str]] = {}
     
     @classmethod
     def register(cls, name: str, formatter_class: type):
         cls._formatters[name] = formatter_class
         
+    @classmethod
+    def register_default(cls, name: str, formatter_class: type):
+        if not isinstance(cls._formatters.get(name, ""), type):
+            cls._formatters[name] = formatter_class
+        
+    @classmethod
+    def register_lazy(cls, name: str, module: str):
+        if not isinstance(cls._formatters.get(name), type):
+            cls._formatters[name] = module
+        
     @classmethod
     def create(cls, name: str, config: Optional[FormatterConfig] = None) -> BaseFormatter:
-        if name not in cls._formatters:
+        formatter_class = cls._formatters.get(name)
+        if isinstance(formatter_class, str):
+            import_module(formatter_class)
+            formatter_class = cls._formatters.get(name)
+        if not isinstance(formatter_class, type):
             raise ValueError(f"Unknown formatter: {name}")
-        return cls._formatters[name](config)
+        return formatter_class(config)
         
     @classmethod
     def available(cls) -> List[str]:
-        return list(cls._formatters.keys())
+        return list(cls._formatters)
 
 
-FormatterFactory.register("simple", SimpleFormatter)
+FormatterFactory.register_default("simple", SimpleFormatter)
@@ -1,11 +1,12 @@
-from typing import List, Optional, Dict
+from typing import List, Optional
 from html import escape as html_escape
-import sys
-import os
+from itertools import accumulate, count
+from functools import lru_cache
+import re
 
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from algorithms.utils import OpType, EditAction
-from formatters.base import BaseFormatter, FormatterConfig, FormatterFactory
+from algorithms.utils import (OpType, EditAction, OP_INSERT, OP_DELETE, OP_EQUAL, OP_REPLACE, op_value_pairs,
+                             count_operations, pack_ops, PackedScript)
+from .base import BaseFormatter, FormatterConfig, FormatterFactory, ROW_BATCH
 
 
 DEFAULT_STYLES = """
@@ -30,116 +31,206 @@ td { padding: 2px 8px; vertical-align: top; white-space: pre-wrap; word-wrap: br
 .gutter { width: 10px; background: #f0f0f0; }
 """
 
+_STYLE_BLOCK = "<style>" + DEFAULT_STYLES + "</style>"
+_HTML_PROLOGUE = '<!DOCTYPE html>\n<html><head><meta charset="UTF-8"><title>Diff: '
+_HTML_HEAD = (_HTML_PROLOGUE + '%s vs %s</title>\n' + _STYLE_BLOCK.replace('%', '%%') + '</head><body>\n'
+              '<div class="diff-container">\n'
+              '<div class="diff-header"><span>--- %s</span><br><span>+++ %s</span></div>\n'
+              '<table>')
+_HTML_TAIL = ('</table>\n'
+              '<div class="stats"><span class="additions">+%d</span>, <span class="deletions">-%d</span></div>\n'
+              '</div></body></html>')
+_SBS_HEAD = (_HTML_PROLOGUE + '%s vs %s</title>\n' + _STYLE_BLOCK.replace('%', '%%') + '</head><body>\n'
+             '<div class="diff-container">\n'
+             '<div class="diff-header">%s vs %s</div>\n'
+             '<table>')
+_SBS_TAIL = '</table>\n</div></body></html>'
+
+_escape_repeated = lru_cache(maxsize=4096)(html_escape)
+
+_ORIG_STEP = bytes.maketrans(bytes([OP_INSERT, OP_DELETE, OP_EQUAL, OP_REPLACE]), bytes([0, 1, 1, 0]))
+_MOD_STEP = bytes.maketrans(bytes([OP_INSERT, OP_DELETE, OP_EQUAL, OP_REPLACE]), bytes([1, 0, 1, 0]))
+
+_ROW_EQUAL = ('<tr class="equal"><td class="line-num">%d</td>'
+              '<td class="marker"> </td><td class="line-num">%d</td><td>%s</td></tr>')
+_ROW_DELETE = ('<tr class="delete"><td class="line-num">%d</td>'
+               '<td class="marker marker-del">-</td><td class="line-num"></td><td>%s</td></tr>')
+_ROW_INSERT = ('<tr class="insert"><td class="line-num"></td>'
+               '<td class="marker marker-ins">+</td><td class="line-num">%d</td><td>%s</td></tr>')
+
+_SBS_EQUAL = ('<tr class="equal"><td class="line-num">%d</td><td class="content">%s</td>'
+              '<td class="gutter"></td><td class="line-num">%d</td><td class="content">%s</td></tr>')
+_SBS_REPLACE = ('<tr><td class="line-num delete">%d</td><td class="content delete">%s</td>'
+                '<td class="gutter"></td><td class="line-num insert">%d</td><td class="content insert">%s</td></tr>')
+_SBS_DELETE = ('<tr><td class="line-num delete">%d</td><td class="content delete">%s</td>'
+               '<td class="gutter"></td><td class="line-num"></td><td class="content"></td></tr>')
+_SBS_INSERT = ('<tr><td class="line-num"></td><td class="content"></td>'
+               '<td class="gutter"></td><td class="line-num insert">%d</td><td class="content insert">%s</td></tr>')
+
+_JSON_EQUAL = ('    {\n      "type": "equal",\n      "orig_line": %d,\n'
+               '      "mod_line": %d,\n      "content": %s\n    }')
+_JSON_DELETE = '    {\n      "type": "delete",\n      "orig_line": %d,\n      "content": %s\n    }'
+_JSON_INSERT = '    {\n      "type": "insert",\n      "mod_line": %d,\n      "content": %s\n    }'
+_JSON_HEAD = '{\n  "file1": %s,\n  "file2": %s,\n  "changes": '
+_JSON_TAIL = (',\n  "stats": {\n'
+              '    "insertions": %d,\n    "deletions": %d,\n    "unchanged": %d\n  }\n}')
+
+
+_OP_RUN = re.compile(rb'(.)\1{0,%d}' % (ROW_BATCH - 1), re.DOTALL)
+
+
+def _equal_rows(values: List[object], orig_line: int, mod_line: int) -> str:
+    escape = _escape_repeated
+    return "".join([_ROW_EQUAL % (o, m, escape(v if type(v) is str else str(v)))
+                    for o, m, v in zip(count(orig_line), count(mod_line), values)])
+
+
+def _delete_rows(values: List[object], orig_line: int, mod_line: int) -> str:
+    escape = html_escape
+    return "".join([_ROW_DELETE % (o, escape(v if type(v) is str else str(v)))
+                    for o, v in zip(count(orig_line), values)])
+
+
+def _insert_rows(values: List[object], orig_line: int, mod_line: int) -> str:
+    escape = html_escape
+    return "".join([_ROW_INSERT % (m, escape(v if type(v) is str else str(v)))
+                    for m, v in zip(count(mod_line), values)])
+
+
+def _no_rows(values: List[object], orig_line: int, mod_line: int) -> str:
+    return ""
+
+
+_RUN_BUILDERS = {
+    OP_EQUAL: _equal_rows,
+    OP_DELETE: _delete_rows,
+    OP_INSERT: _insert_rows,
+    OP_REPLACE: _no_rows,
+}
+
 
 class HTMLFormatter(BaseFormatter):
+    packed_input = True
+    
     def __init__(self, config: Optional[FormatterConfig] = None):
         super().__init__(config)
 
     def _format_impl(self, script: List[EditAction], file1: str, file2: str,
                      lines1: Optional[List[str]], lines2: Optional[List[str]]):
-        rows, insertions, deletions = [], 0, 0
-        orig_line, mod_line = 1, 1
-        for action in script:
-            v = html_escape(str(action.value))
-            if action.op == OpType.EQUAL:
-                rows.append(f'<tr class="equal"><td class="line-num">{orig_line}</td>'
-                           f'<td class="marker"> </td><td class="line-num">{mod_line}</td><td>{v}</td></tr>')
-                orig_line += 1
-                mod_line += 1
-            elif action.op == OpType.DELETE:
-                rows.append(f'<tr class="delete"><td class="line-num">{orig_line}</td>'
-                           f'<td class="marker marker-del">-</td><td class="line-num"></td><td>{v}</td></tr>')
-                orig_line += 1
-                deletions += 1
-            elif action.op == OpType.INSERT:
-                rows.append(f'<tr class="insert"><td class="line-num"></td>'
-                           f'<td class="marker marker-ins">+</td><td class="line-num">{mod_line}</td><td>{v}</td></tr>')
-                mod_line += 1
-                insertions += 1
-
-        html = f"""<!DOCTYPE html>
-<html><head><meta charset="UTF-8"><title>Diff: {html_escape(file1)} vs {html_escape(file2)}</title>
-<style>{DEFAULT_STYLES}</style></head><body>
-<div class="diff-container">
-<div class="diff-header"><span>--- {html_escape(file1)}</span><br><span>+++ {html_escape(file2)}</span></div>
-<table>{"".join(rows)}</table>
-<div class="stats"><span class="additions">+{insertions}</span>, <span class="deletions">-{deletions}</span></div>
-</div></body></html>"""
-        self._write(html)
+        write = self._write
+        name1, name2 = html_escape(file1), html_escape(file2)
+        write(_HTML_HEAD % (name1, name2, name1, name2))
+        codes = pack_ops(script)
+        values = script.values if isinstance(script, PackedScript) else [action.value for action in script]
+        builders = _RUN_BUILDERS
+        parts: List[str] = []
+        append = parts.append
+        orig_line = mod_line = 1
+        pending = 0
+        for run in _OP_RUN.finditer(codes):
+            start, end = run.span()
+            code = codes[start]
+            append(builders[code](values[start:end], orig_line, mod_line))
+            size = end - start
+            orig_line += _ORIG_STEP[code] * size
+            mod_line += _MOD_STEP[code] * size
+            pending += size
+            if pending >= ROW_BATCH:
+                write("".join(parts))
+                parts.clear()
+                pending = 0
+        write("".join(parts))
+        counts = count_operations(script)
+        write(_HTML_TAIL % (counts['inserts'], counts['deletes']))
 
 
 class SideBySideHTMLFormatter(BaseFormatter):
+    packed_input = True
+    
     def _format_impl(self, script: List[EditAction], file1: str, file2: str,
                      lines1: Optional[List[str]], lines2: Optional[List[str]]):
+        EQUAL, DELETE, INSERT = OpType.EQUAL, OpType.DELETE, OpType.INSERT
+        write = self._write
+        name1, name2 = html_escape(file1), html_escape(file2)
+        write(_SBS_HEAD % (name1, name2, name1, name2))
         rows = []
-        left_num, right_num, i = 1, 1, 0
-        while i < len(script):
-            a = script[i]
-            if a.op == OpType.EQUAL:
-                v = html_escape(str(a.value))
-                rows.append(f'<tr class="equal"><td class="line-num">{left_num}</td><td class="content">{v}</td>'
-                           f'<td class="gutter"></td><td class="line-num">{right_num}</td><td class="content">{v}</td></tr>')
+        append = rows.append
+        escape = html_escape
+        escape_repeated = _escape_repeated
+        left_num, right_num = 1, 1
+        pairs = op_value_pairs(script)
+        pair = next(pairs, None)
+        while pair is not None:
+            if len(rows) >= ROW_BATCH:
+                write("".join(rows))
+                rows.clear()
+            op, v = pair
+            pair = next(pairs, None)
+            if type(v) is not str:
+                v = str(v)
+            if op is EQUAL:
+                v = escape_repeated(v)
+                append(_SBS_EQUAL % (left_num, v, right_num, v))
                 left_num += 1
                 right_num += 1
-                i += 1
-            elif a.op == OpType.DELETE:
-                lv = html_escape(str(a.value))
-                if i + 1 < len(script) and script[i + 1].op == OpType.INSERT:
-                    rv = html_escape(str(script[i + 1].value))
-                    rows.append(f'<tr><td class="line-num delete">{left_num}</td><td class="content delete">{lv}</td>'
-                               f'<td class="gutter"></td><td class="line-num insert">{right_num}</td><td class="content insert">{rv}</td></tr>')
+            elif op is DELETE:
+                lv = escape(v)
+                if pair is not None and pair[0] is INSERT:
+                    rv = pair[1]
+                    pair = next(pairs, None)
+                    rv = escape(rv if type(rv) is str else str(rv))
+                    append(_SBS_REPLACE % (left_num, lv, right_num, rv))
                     left_num += 1
                     right_num += 1
-                    i += 2
                 else:
-                    rows.append(f'<tr><td class="line-num delete">{left_num}</td><td class="content delete">{lv}</td>'
-                               f'<td class="gutter"></td><td class="line-num"></td><td class="content"></td></tr>')
+                    append(_SBS_DELETE % (left_num, lv))
                     left_num += 1
-                    i += 1
-            elif a.op == OpType.INSERT:
-                rv = html_escape(str(a.value))
-                rows.append(f'<tr><td class="line-num"></td><td class="content"></td>'
-                           f'<td class="gutter"></td><td class="line-num insert">{right_num}</td><td class="content insert">{rv}</td></tr>')
+            elif op is INSERT:
+                rv = escape(v)
+                append(_SBS_INSERT % (right_num, rv))
                 right_num += 1
-                i += 1
-            else:
-                i += 1
 
-        html = f"""<!DOCTYPE html>
-<html><head><meta charset="UTF-8"><title>Diff: {html_escape(file1)} vs {html_escape(file2)}</title>
-<style>{DEFAULT_STYLES}</style></head><body>
-<div class="diff-container">
-<div class="diff-header">{html_escape(file1)} vs {html_escape(file2)}</div>
-<table>{"".join(rows)}</table>
-</div></body></html>"""
-        self._write(html)
+        write("".join(rows))
+        write(_SBS_TAIL)
 
 
 class JSONFormatter(BaseFormatter):
+    packed_input = True
+    
     def _format_impl(self, script: List[EditAction], file1: str, file2: str,
                      lines1: Optional[List[str]], lines2: Optional[List[str]]):
         import json
-        result = {"file1": file1, "file2": file2, "changes": [],
-                  "stats": {"insertions": 0, "deletions": 0, "unchanged": 0}}
-        orig_line, mod_line = 1, 1
-        for a in script:
-            v = str(a.value)
-            if a.op == OpType.EQUAL:
-                result["changes"].append({"type": "equal", "orig_line": orig_line, "mod_line": mod_line, "content": v})
-                result["stats"]["unchanged"] += 1
-                orig_line += 1
-                mod_line += 1
-            elif a.op == OpType.DELETE:
-                result["changes"].append({"type": "delete", "orig_line": orig_line, "content": v})
-                result["stats"]["deletions"] += 1
-                orig_line += 1
-            elif a.op == OpType.INSERT:
-                result["changes"].append({"type": "insert", "mod_line": mod_line, "content": v})
-                result["stats"]["insertions"] += 1
-                mod_line += 1
-        self._write(json.dumps(result, indent=2, ensure_ascii=False))
-
-
-FormatterFactory.register("html", HTMLFormatter)
-FormatterFactory.register("html-side-by-side", SideBySideHTMLFormatter)
-FormatterFactory.register("json", JSONFormatter)
+        from json.encoder import encode_basestring
+        EQUAL, DELETE, INSERT = OpType.EQUAL, OpType.DELETE, OpType.INSERT
+        write = self._write
+        write(_JSON_HEAD % (json.dumps(file1, ensure_ascii=False), json.dumps(file2, ensure_ascii=False)))
+        changes = []
+        append = changes.append
+        opening = "[\n"
+        codes = pack_ops(script)
+        orig_lines = accumulate(codes.translate(_ORIG_STEP), initial=1)
+        mod_lines = accumulate(codes.translate(_MOD_STEP), initial=1)
+        for (op, value), orig_line, mod_line in zip(op_value_pairs(script), orig_lines, mod_lines):
+            if len(changes) >= ROW_BATCH:
+                write(opening + ",\n".join(changes))
+                opening = ",\n"
+                changes.clear()
+            if type(value) is not str:
+                value = str(value)
+            if op is EQUAL:
+                append(_JSON_EQUAL % (orig_line, mod_line, encode_basestring(value)))
+            elif op is DELETE:
+                append(_JSON_DELETE % (orig_line, encode_basestring(value)))
+            elif op is INSERT:
+                append(_JSON_INSERT % (mod_line, encode_basestring(value)))
+        if changes:
+            write(opening + ",\n".join(changes))
+            opening = ",\n"
+        counts = count_operations(script)
+        write(("[]" if opening == "[\n" else "\n  ]") +
+              _JSON_TAIL % (counts['inserts'], counts['deletes'], counts['equals']))
+
+
+FormatterFactory.register_default("html", HTMLFormatter)
+FormatterFactory.register_default("html-side-by-side", SideBySideHTMLFormatter)
+FormatterFactory.register_default("json", JSONFormatter)
@@ -1,11 +1,10 @@
-from typing import List, Optional, Tuple
-import sys
-import os
+from typing import List, Optional, Tuple, Dict, Iterator, Iterable
+from collections import deque
+from itertools import islice
 
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-from algorithms.utils import OpType, EditAction
-from formatters.base import BaseFormatter, FormatterConfig, FormatterFactory
+from algorithms.utils import (OpType, EditAction, OP_INSERT, OP_DELETE, OP_EQUAL, OP_REPLACE, OP_TYPES, OP_CODES,
+                             op_value_pairs)
+from .base import BaseFormatter, FormatterConfig, FormatterFactory, ROW_BATCH
 
 
 class ColumnConfig:
@@ -47,20 +46,27 @@ class TextTruncator:
     def truncate_and_pad(self, text: str) -> str:
         truncated = self.truncate(text)
         return self.pad(truncated)
+        
+    def fit(self, text: str) -> str:
+        width = self.max_width
+        if len(text) <= width:
+            return text.ljust(width)
+        room = width - len(self.ellipsis)
+        if room > 0:
+            return text[:room] + self.ellipsis
+        return self.pad(self.truncate(text))
 
 
 class LineNumberFormatter:
     def __init__(self, width: int = 4, padding_char: str = " "):
         self.width = width
         self.padding_char = padding_char
+        self._blank = padding_char * width
         
     def format(self, line_num: Optional[int]) -> str:
         if line_num is None:
-            return self.padding_char * self.width
-        num_str = str(line_num)
-        if len(num_str) >= self.width:
-            return num_str[:self.width]
-        return self.padding_char * (self.width - len(num_str)) + num_str
+            return self._blank
+        return str(line_num).rjust(self.width, self.padding_char)[:self.width]
 
 
 class GutterFormatter:
@@ -71,18 +77,22 @@ class GutterFormatter:
         self.change_marker = " < "
         self.delete_marker = " < "
         self.insert_marker = " > "
+        self.equal = self.equal_marker
+        self.change = f"{colors.yellow}{self.change_marker}{colors.reset}"
+        self.delete = f"{colors.red}{self.delete_marker}{colors.reset}"
+        self.insert = f"{colors.green}{self.insert_marker}{colors.reset}"
         
     def format_equal(self) -> str:
-        return self.equal_marker
+        return self.equal
         
     def format_change(self) -> str:
-        return f"{self.colors.yellow}{self.change_marker}{self.colors.reset}"
+        return self.change
         
     def format_delete(self) -> str:
-        return f"{self.colors.red}{self.delete_marker}{self.colors.reset}"
+        return self.delete
         
     def format_insert(self) -> str:
-        return f"{self.colors.green}{self.insert_marker}{self.colors.reset}"
+        return self.insert
 
 
 class SideBySideRow:
@@ -106,62 +116,39 @@ class SideBySideGenerator:
         self.rows: List[SideBySideRow] = []
         
     def generate(self, script: List[EditAction]) -> List[SideBySideRow]:
-        self.rows = []
+        types = OP_TYPES
+        self.rows = [SideBySideRow(left_num, left_content, right_num, right_content, types[change_type])
+                     for left_num, left_content, right_num, right_content, change_type
+                     in self.iter_rows(script)]
+        return self.rows
+        
+    def iter_rows(self, script: List[EditAction]) -> Iterator[Tuple[Optional[int], str, Optional[int], str, int]]:
+        EQUAL, DELETE, INSERT = OpType.EQUAL, OpType.DELETE, OpType.INSERT
         left_num = 1
         right_num = 1
-        i = 0
-        while i < len(script):
-            action = script[i]
-            if action.op == OpType.EQUAL:
-                row = SideBySideRow(
-                    left_num=left_num,
-                    left_content=str(action.value),
-                    right_num=right_num,
-                    right_content=str(action.value),
-                    change_type=OpType.EQUAL
-                )
-                self.rows.append(row)
+        pairs = op_value_pairs(script)
+        pair = next(pairs, None)
+        while pair is not None:
+            op, value = pair
+            pair = next(pairs, None)
+            if type(value) is not str:
+                value = str(value)
+            if op is EQUAL:
+                yield left_num, value, right_num, value, OP_EQUAL
                 left_num += 1
                 right_num += 1
-                i += 1
-            elif action.op == OpType.DELETE:
-                if i + 1 < len(script) and script[i + 1].op == OpType.INSERT:
-                    row = SideBySideRow(
-                        left_num=left_num,
-                        left_content=str(action.value),
-                        right_num=right_num,
-                        right_content=str(script[i + 1].value),
-                        change_type=OpType.REPLACE
-                    )
-                    self.rows.append(row)
-                    left_num += 1
+            elif op is DELETE:
+                if pair is not None and pair[0] is INSERT:
+                    right = pair[1]
+                    yield left_num, value, right_num, right if type(right) is str else str(right), OP_REPLACE
                     right_num += 1
-                    i += 2
+                    pair = next(pairs, None)
                 else:
-                    row = SideBySideRow(
-                        left_num=left_num,
-                        left_content=str(action.value),
-                        right_num=None,
-                        right_content="",
-                        change_type=OpType.DELETE
-                    )
-                    self.rows.append(row)
-                    left_num += 1
-                    i += 1
-            elif action.op == OpType.INSERT:
-                row = SideBySideRow(
-                    left_num=None,
-                    left_content="",
-                    right_num=right_num,
-                    right_content=str(action.value),
-                    change_type=OpType.INSERT
-                )
-                self.rows.append(row)
+                    yield left_num, value, None, "", OP_DELETE
+                left_num += 1
+            elif op is INSERT:
+                yield None, "", right_num, value, OP_INSERT
                 right_num += 1
-                i += 1
-            else:
-                i += 1
-        return self.rows
 
 
 class SideBySideRowFormatter:
@@ -172,31 +159,65 @@ class SideBySideRowFormatter:
         self.truncator = TextTruncator(config.content_width)
         self.line_num_fmt = LineNumberFormatter(config.line_num_width)
         self.gutter_fmt = GutterFormatter(colors, config.gutter_width)
+        self._templates = self._build_templates()
+        
+    def _build_templates(self) -> Tuple[str, ...]:
+        gutter = self.gutter_fmt
+        templates = [""] * len(OP_TYPES) + ["%s %s | %s %s"]
+        if self.use_color:
+            red, green, reset = self.colors.red, self.colors.green, self.colors.reset
+            templates[OP_EQUAL] = f"%s %s{gutter.equal}%s %s"
+            templates[OP_DELETE] = f"{red}%s %s{reset}{gutter.delete}%s %s"
+            templates[OP_INSERT] = f"%s %s{gutter.insert}{green}%s %s{reset}"
+            templates[OP_REPLACE] = f"{red}%s %s{reset}{gutter.change}{green}%s %s{reset}"
+        else:
+            templates[OP_EQUAL] = f"%s %s{gutter.equal}%s %s"
+            templates[OP_DELETE] = f"%s %s{gutter.delete}%s %s"
+            templates[OP_INSERT] = f"%s %s{gutter.insert}%s %s"
+            templates[OP_REPLACE] = f"%s %s{gutter.change}%s %s"
+        return tuple(templates)
         
     def format_row(self, row: SideBySideRow) -> str:
-        left_num = self.line_num_fmt.format(row.left_num)
-        left_content = self.truncator.truncate_and_pad(row.left_content)
-        right_num = self.line_num_fmt.format(row.right_num)
-        right_content = self.truncator.truncate(row.right_content)
-        if row.change_type == OpType.EQUAL:
-            gutter = self.gutter_fmt.format_equal()
-            return f"{left_num} {left_content}{gutter}{right_num} {right_content}"
-        elif row.change_type == OpType.DELETE:
-            gutter = self.gutter_fmt.format_delete()
-            if self.use_color:
-                return f"{self.colors.red}{left_num} {left_content}{self.colors.reset}{gutter}{right_num} {right_content}"
-            return f"{left_num} {left_content}{gutter}{right_num} {right_content}"
-        elif row.change_type == OpType.INSERT:
-            gutter = self.gutter_fmt.format_insert()
-            if self.use_color:
-                return f"{left_num} {left_content}{gutter}{self.colors.green}{right_num} {right_content}{self.colors.reset}"
-            return f"{left_num} {left_content}{gutter}{right_num} {right_content}"
-        elif row.change_type == OpType.REPLACE:
-            gutter = self.gutter_fmt.format_change()
-            if self.use_color:
-                return f"{self.colors.red}{left_num} {left_content}{self.colors.reset}{gutter}{self.colors.green}{right_num} {right_content}{self.colors.reset}"
-            return f"{left_num} {left_content}{gutter}{right_num} {right_content}"
-        return f"{left_num} {left_content} | {right_num} {right_content}"
+        return self._format_cells(row.left_num, row.left_content, row.right_num, row.right_content,
+                                  OP_CODES.get(row.change_type, len(OP_TYPES)))
+        
+    def iter_format(self, rows: Iterable[Tuple[Optional[int], str, Optional[int], str, int]],
+                    size: int) -> Iterator[str]:
+        cells = self._number_cells(size)
+        templates = self._templates
+        truncator = self.truncator
+        width, ellipsis = truncator.max_width, truncator.ellipsis
+        room = width - len(ellipsis)
+        if room <= 0:
+            fit, truncate = truncator.fit, truncator.truncate
+            for left_num, left_content, right_num, right_content, change_type in rows:
+                yield templates[change_type] % (cells[left_num], fit(left_content),
+                                                cells[right_num], truncate(right_content))
+            return
+        for left_num, left_content, right_num, right_content, change_type in rows:
+            if len(left_content) > width:
+                left_content = left_content[:room] + ellipsis
+            if len(right_content) > width:
+                right_content = right_content[:room] + ellipsis
+            yield templates[change_type] % (cells[left_num], left_content.ljust(width),
+                                            cells[right_num], right_content)
+        
+    def _number_cells(self, size: int) -> Dict[Optional[int], str]:
+        fmt = self.line_num_fmt.format
+        numbers = range(1, size + 1)
+        cells: Dict[Optional[int], str] = dict(zip(numbers, map(fmt, numbers)))
+        cells[None] = fmt(None)
+        return cells
+        
+    def _format_cells(self, left_num: Optional[int], left_content: str, right_num: Optional[int],
+                      right_content: str, change_type: int) -> str:
+        return self._format_prepared(self.line_num_fmt.format(left_num), left_content,
+                                     self.line_num_fmt.format(right_num), right_content, change_type)
+        
+    def _format_prepared(self, left_cell: str, left_content: str, right_cell: str,
+                         right_content: str, change_type: int) -> str:
+        return self._templates[change_type] % (left_cell, self.truncator.fit(left_content),
+                                               right_cell, self.truncator.truncate(right_content))
 
 
 class SideBySideHeader:
@@ -211,7 +232,7 @@ class SideBySideHeader:
         return "=" * self.config.total_width
         
     def format_filenames(self) -> str:
-        left = self.truncator.truncate_and_pad(self.file1)
+        left = self.truncator.fit(self.file1)
         right = self.truncator.truncate(self.file2)
         return f"{left} | {right}"
         
@@ -224,6 +245,8 @@ class SideBySideHeader:
 
 
 class SideBySideFormatter(BaseFormatter):
+    packed_input = True
+    
     def __init__(self, config: Optional[FormatterConfig] = None):
         super().__init__(config)
         self.column_config = ColumnConfig(self.config.width)
@@ -243,15 +266,17 @@ class SideBySideFormatter(BaseFormatter):
         lines2: Optional[List[str]]
     ):
         header = SideBySideHeader(self.column_config, self.colors, file1, file2)
-        for line in header.format_header_lines():
-            self._writeln(line)
-        rows = self.generator.generate(script)
-        for row in rows:
-            line = self.row_formatter.format_row(row)
-            self._writeln(line)
+        self._writelines(header.format_header_lines())
+        stream = self.row_formatter.iter_format(self.generator.iter_rows(script), len(script))
+        batch = list(islice(stream, ROW_BATCH))
+        while batch:
+            self._writelines(batch)
+            batch = list(islice(stream, ROW_BATCH))
 
 
 class CompactSideBySideFormatter(BaseFormatter):
+    packed_input = True
+    
     def __init__(self, config: Optional[FormatterConfig] = None):
         super().__init__(config)
         self.column_config = ColumnConfig(self.config.width)
@@ -265,46 +290,54 @@ class CompactSideBySideFormatter(BaseFormatter):
         lines1: Optional[List[str]],
         lines2: Optional[List[str]]
     ):
-        rows = self.generator.generate(script)
-        changed_rows = [r for r in rows if r.change_type != OpType.EQUAL]
-        if not changed_rows:
-            self._writeln("Files are identical")
-            return
+        context = self.config.context_lines
         col_width = (self.config.width - 7) // 2
         truncator = TextTruncator(col_width)
-        self._writeln(f"{'=' * self.config.width}")
-        left_header = truncator.truncate_and_pad(file1)
-        right_header = truncator.truncate(file2)
-        self._writeln(f"{left_header}   |   {right_header}")
-        self._writeln(f"{'=' * self.config.width}")
-        context_before = self.config.context_lines
-        context_after = self.config.context_lines
-        all_indices = set()
-        for i, row in enumerate(rows):
-            if row.change_type != OpType.EQUAL:
-                for j in range(max(0, i - context_before), min(len(rows), i + context_after + 1)):
-                    all_indices.add(j)
-        sorted_indices = sorted(all_indices)
-        prev_idx = -2
-        for idx in sorted_indices:
-            if idx > prev_idx + 1:
-                if prev_idx >= 0:
-                    self._writeln(f"{'-' * self.config.width}")
-            row = rows[idx]
-            left = truncator.truncate_and_pad(row.left_content)
-            right = truncator.truncate(row.right_content)
-            if row.change_type == OpType.EQUAL:
-                self._writeln(f"{left}   |   {right}")
-            elif row.change_type == OpType.DELETE:
-                self._writeln(f"{self.colors.red}{left}{self.colors.reset}   <   {right}")
-            elif row.change_type == OpType.INSERT:
-                self._writeln(f"{left}   >   {self.colors.green}{right}{self.colors.reset}")
-            elif row.change_type == OpType.REPLACE:
-                self._writeln(f"{self.colors.red}{left}{self.colors.reset}   |   {self.colors.green}{right}{self.colors.reset}")
-            prev_idx = idx
+        fit, truncate = truncator.fit, truncator.truncate
+        separator = '-' * self.config.width
+        red, green, reset = self.colors.red, self.colors.green, self.colors.reset
+        templates = [""] * len(OP_TYPES)
+        templates[OP_EQUAL] = "%s   |   %s"
+        templates[OP_DELETE] = f"{red}%s{reset}   <   %s"
+        templates[OP_INSERT] = f"%s   >   {green}%s{reset}"
+        templates[OP_REPLACE] = f"{red}%s{reset}   |   {green}%s{reset}"
+        equal = templates[OP_EQUAL]
+        lines: List[str] = []
+        append = lines.append
+        leading: deque = deque(maxlen=context)
+        trailing = 0
+        last_shown = -1
+        for i, (_, left_content, _, right_content, change_type) in enumerate(self.generator.iter_rows(script)):
+            if change_type != OP_EQUAL:
+                if last_shown < 0:
+                    rule = '=' * self.config.width
+                    self._writelines([rule, f"{fit(file1)}   |   {truncate(file2)}", rule])
+                elif i - len(leading) > last_shown + 1:
+                    append(separator)
+                for left, right in leading:
+                    append(equal % (fit(left), truncate(right)))
+                leading.clear()
+                append(templates[change_type] % (fit(left_content), truncate(right_content)))
+                trailing = context
+                last_shown = i
+                if len(lines) >= ROW_BATCH:
+                    self._writelines(lines)
+                    lines.clear()
+            elif trailing:
+                append(equal % (fit(left_content), truncate(right_content)))
+                trailing -= 1
+                last_shown = i
+            elif context:
+                leading.append((left_content, right_content))
+        if last_shown < 0:
+            self._writeln("Files are identical")
+            return
+        self._writelines(lines)
 
 
 class WordDiffFormatter(BaseFormatter):
+    packed_input = True
+    
     def __init__(self, config: Optional[FormatterConfig] = None):
         super().__init__(config)
         self.column_config = ColumnConfig(self.config.width)
@@ -318,17 +351,16 @@ class WordDiffFormatter(BaseFormatter):
         lines1: Optional[List[str]],
         lines2: Optional[List[str]]
     ):
-        self._writeln(f"diff {file1} {file2}")
-        rows = self.generator.generate(script)
-        for row in rows:
-            if row.change_type == OpType.EQUAL:
-                self._writeln(f" {row.left_content}")
-            elif row.change_type == OpType.DELETE:
-                self._writeln(f"{self.colors.red}[-{row.left_content}-]{self.colors.reset}")
-            elif row.change_type == OpType.INSERT:
-                self._writeln(f"{self.colors.green}{{+{row.right_content}+}}{self.colors.reset}")
-            elif row.change_type == OpType.REPLACE:
-                self._writeln(f"{self.colors.red}[-{row.left_content}-]{self.colors.reset}{self.colors.green}{{+{row.right_content}+}}{self.colors.reset}")
+        red, green, reset = self.colors.red, self.colors.green, self.colors.reset
+        templates = [""] * len(OP_TYPES)
+        templates[OP_EQUAL] = " %s%.0s"
+        templates[OP_DELETE] = f"{red}[-%s-]{reset}%.0s"
+        templates[OP_INSERT] = f"%.0s{green}{{+%s+}}{reset}"
+        templates[OP_REPLACE] = f"{red}[-%s-]{reset}{green}{{+%s+}}{reset}"
+        lines = [f"diff {file1} {file2}"]
+        lines.extend(templates[change_type] % (left_content, right_content)
+                     for _, left_content, _, right_content, change_type in self.generator.iter_rows(script))
+        self._writelines(lines)
 
 
 class InlineDiffFormatter(BaseFormatter):
@@ -340,23 +372,26 @@ class InlineDiffFormatter(BaseFormatter):
         lines1: Optional[List[str]],
         lines2: Optional[List[str]]
     ):
-        self._writeln(f"--- {file1}")
-        self._writeln(f"+++ {file2}")
-        self._writeln("")
+        EQUAL, DELETE, INSERT = OpType.EQUAL, OpType.DELETE, OpType.INSERT
+        lines = [f"--- {file1}", f"+++ {file2}", ""]
+        append = lines.append
         line_num = 1
         for action in script:
-            value = str(action.value)
-            if action.op == OpType.EQUAL:
-                self._writeln(f"{line_num:4d}   {value}")
+            value = action.value
+            if type(value) is not str:
+                value = str(value)
+            if action.op is EQUAL:
+                append(f"{line_num:4d}   {value}")
                 line_num += 1
-            elif action.op == OpType.DELETE:
-                self._writeln(f"{line_num:4d} {self.colors.red}- {value}{self.colors.reset}")
+            elif action.op is DELETE:
+                append(f"{line_num:4d} {self.colors.red}- {value}{self.colors.reset}")
                 line_num += 1
-            elif action.op == OpType.INSERT:
-                self._writeln(f"     {self.colors.green}+ {value}{self.colors.reset}")
+            elif action.op is INSERT:
+                append(f"     {self.colors.green}+ {value}{self.colors.reset}")
+        self._writelines(lines)
 
 
-FormatterFactory.register("side-by-side", SideBySideFormatter)
-FormatterFactory.register("compact", CompactSideBySideFormatter)
-FormatterFactory.register("word", WordDiffFormatter)
-FormatterFactory.register("inline", InlineDiffFormatter)
\ No newline at end of file
+FormatterFactory.register_default("side-by-side", SideBySideFormatter)
+FormatterFactory.register_default("compact", CompactSideBySideFormatter)
+FormatterFactory.register_default("word", WordDiffFormatter)
+FormatterFactory.register_default("inline", InlineDiffFormatter)
\ No newline at end of file
@@ -1,10 +1,9 @@
 from typing import List, Optional
-import sys
-import os
+from itertools import chain, groupby
+from operator import itemgetter
 
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from algorithms.utils import OpType, EditAction
-from formatters.base import BaseFormatter, FormatterConfig, FormatterFactory, HunkGenerator, DiffHunk
+from .base import BaseFormatter, FormatterConfig, FormatterFactory, HunkGenerator, DiffHunk
 
 
 class UnifiedFormatter(BaseFormatter):
@@ -16,22 +15,26 @@ class UnifiedFormatter(BaseFormatter):
                      lines1: Optional[List[str]], lines2: Optional[List[str]]):
         if not self.has_changes(script):
             return
-        self._writeln(f"{self.colors.bold}--- {file1}{self.colors.reset}")
-        self._writeln(f"{self.colors.bold}+++ {file2}{self.colors.reset}")
+        lines = [f"{self.colors.bold}--- {file1}{self.colors.reset}",
+                 f"{self.colors.bold}+++ {file2}{self.colors.reset}"]
         for hunk in self.hunk_generator.generate(script):
-            self._write_hunk(hunk)
+            self._hunk_lines(hunk, lines.append)
+        self._writelines(lines)
 
-    def _write_hunk(self, hunk: DiffHunk):
+    def _hunk_lines(self, hunk: DiffHunk, append):
+        EQUAL, DELETE, INSERT = OpType.EQUAL, OpType.DELETE, OpType.INSERT
         header = f"@@ -{hunk.orig_start + 1},{hunk.orig_count} +{hunk.mod_start + 1},{hunk.mod_count} @@"
-        self._writeln(f"{self.colors.cyan}{header}{self.colors.reset}")
+        append(f"{self.colors.cyan}{header}{self.colors.reset}")
         for a in hunk.actions:
-            v = str(a.value)
-            if a.op == OpType.EQUAL:
-                self._writeln(f" {v}")
-            elif a.op == OpType.DELETE:
-                self._writeln(f"{self.colors.red}-{v}{self.colors.reset}" if self.config.use_color else f"-{v}")
-            elif a.op == OpType.INSERT:
-                self._writeln(f"{self.colors.green}+{v}{self.colors.reset}" if self.config.use_color else f"+{v}")
+            v = a.value
+            if type(v) is not str:
+                v = str(v)
+            if a.op is EQUAL:
+                append(f" {v}")
+            elif a.op is DELETE:
+                append(f"{self.colors.red}-{v}{self.colors.reset}" if self.config.use_color else f"-{v}")
+            elif a.op is INSERT:
+                append(f"{self.colors.green}+{v}{self.colors.reset}" if self.config.use_color else f"+{v}")
 
 
 class ContextDiffFormatter(BaseFormatter):
@@ -41,78 +44,71 @@ class ContextDiffFormatter(BaseFormatter):
 
     def _format_impl(self, script: List[EditAction], file1: str, file2: str,
                      lines1: Optional[List[str]], lines2: Optional[List[str]]):
+        EQUAL, DELETE, INSERT = OpType.EQUAL, OpType.DELETE, OpType.INSERT
         if not self.has_changes(script):
             return
-        self._writeln(f"*** {file1}")
-        self._writeln(f"--- {file2}")
+        lines = [f"*** {file1}", f"--- {file2}"]
+        append = lines.append
         for hunk in self.hunk_generator.generate(script):
-            self._writeln("***************")
-            self._writeln(f"*** {hunk.orig_start + 1},{hunk.orig_start + hunk.orig_count} ****")
-            for a in hunk.actions:
-                if a.op == OpType.EQUAL:
-                    self._writeln(f"  {a.value}")
-                elif a.op == OpType.DELETE:
-                    self._writeln(f"- {a.value}")
-            self._writeln(f"--- {hunk.mod_start + 1},{hunk.mod_start + hunk.mod_count} ----")
-            for a in hunk.actions:
-                if a.op == OpType.EQUAL:
-                    self._writeln(f"  {a.value}")
-                elif a.op == OpType.INSERT:
-                    self._writeln(f"+ {a.value}")
+            ops = [a.op for a in hunk.actions]
+            values = [v if type(v) is str else str(v) for v in (a.value for a in hunk.actions)]
+            append("***************")
+            append(f"*** {hunk.orig_start + 1},{hunk.orig_start + hunk.orig_count} ****")
+            for op, v in zip(ops, values):
+                if op is EQUAL:
+                    append(f"  {v}")
+                elif op is DELETE:
+                    append(f"- {v}")
+            append(f"--- {hunk.mod_start + 1},{hunk.mod_start + hunk.mod_count} ----")
+            for op, v in zip(ops, values):
+                if op is EQUAL:
+                    append(f"  {v}")
+                elif op is INSERT:
+                    append(f"+ {v}")
+        self._writelines(lines)
 
 
 class NormalDiffFormatter(BaseFormatter):
     def _format_impl(self, script: List[EditAction], file1: str, file2: str,
                      lines1: Optional[List[str]], lines2: Optional[List[str]]):
+        EQUAL, DELETE, INSERT = OpType.EQUAL, OpType.DELETE, OpType.INSERT
         if not self.has_changes(script):
             return
-        orig_line, mod_line, i = 0, 0, 0
-        while i < len(script):
-            a = script[i]
-            if a.op == OpType.EQUAL:
-                orig_line += 1
-                mod_line += 1
-                i += 1
-            elif a.op == OpType.DELETE:
-                del_start, dels = orig_line + 1, []
-                while i < len(script) and script[i].op == OpType.DELETE:
-                    dels.append(script[i].value)
-                    orig_line += 1
-                    i += 1
-                ins = []
+        lines: List[str] = []
+        append = lines.append
+        orig_line, mod_line = 0, 0
+        del_start, dels = 0, []
+        for op, group in chain(groupby(script, key=itemgetter(0)), [(None, ())]):
+            if op is DELETE:
+                del_start = orig_line + 1
+                dels = [v if type(v) is str else str(v) for v in map(itemgetter(1), group)]
+                orig_line += len(dels)
+                continue
+            if op is INSERT:
                 ins_start = mod_line + 1
-                while i < len(script) and script[i].op == OpType.INSERT:
-                    ins.append(script[i].value)
-                    mod_line += 1
-                    i += 1
-                del_end = del_start + len(dels) - 1
-                ins_end = ins_start + len(ins) - 1
-                if ins and dels:
-                    self._writeln(f"{del_start},{del_end}c{ins_start},{ins_end}")
-                    for l in dels:
-                        self._writeln(f"< {l}")
-                    self._writeln("---")
-                    for l in ins:
-                        self._writeln(f"> {l}")
-                elif dels:
-                    r = f"{del_start}" if len(dels) == 1 else f"{del_start},{del_end}"
-                    self._writeln(f"{r}d{mod_line}")
-                    for l in dels:
-                        self._writeln(f"< {l}")
-            elif a.op == OpType.INSERT:
-                ins_start, ins = mod_line + 1, []
-                while i < len(script) and script[i].op == OpType.INSERT:
-                    ins.append(script[i].value)
-                    mod_line += 1
-                    i += 1
-                r = f"{ins_start}" if len(ins) == 1 else f"{ins_start},{ins_start + len(ins) - 1}"
-                self._writeln(f"{orig_line}a{r}")
-                for l in ins:
-                    self._writeln(f"> {l}")
+                ins = [v if type(v) is str else str(v) for v in map(itemgetter(1), group)]
+                mod_line += len(ins)
+                if dels:
+                    append(f"{del_start},{del_start + len(dels) - 1}c{ins_start},{mod_line}")
+                    append("\n".join(["< " + l for l in dels]))
+                    append("---")
+                else:
+                    r = f"{ins_start}" if len(ins) == 1 else f"{ins_start},{mod_line}"
+                    append(f"{orig_line}a{r}")
+                append("\n".join(["> " + l for l in ins]))
             else:
-                i += 1
+                if dels:
+                    r = f"{del_start}" if len(dels) == 1 else f"{del_start},{orig_line}"
+                    append(f"{r}d{mod_line}")
+                    append("\n".join(["< " + l for l in dels]))
+                if op is EQUAL:
+                    run = len(list(group))
+                    orig_line += run
+                    mod_line += run
+            dels = []
+        self._writelines(lines)
 
 
-FormatterFactory.register("unified", UnifiedFormatter)
-FormatterFactory.register("context", ContextDiffFormatter)
-FormatterFactory.register("normal", NormalDiffFormatter)
\ No newline at end of file
+FormatterFactory.register_default("unified", UnifiedFormatter)
+FormatterFactory.register_default("context", ContextDiffFormatter)
+FormatterFactory.register_default("normal", NormalDiffFormatter)
\ No newline at end of file
@@ -79,3 +79,60 @@ def test_cli_main_inprocess_html(tmp_path, capsys):
     assert ("<!DOCTYPE html>" in captured.out or "<html" in captured.out) or (
         captured.err and ("Error" in captured.err or "Error:" in captured.err)
     )
+
+
+def test_cli_reuses_cached_reads_and_diffs(tmp_path):
+    from src import cli
+
+    f1 = tmp_path / "a.txt"
+    f2 = tmp_path / "b.txt"
+    f1.write_text("one\ntwo\n", encoding="utf-8")
+    f2.write_text("one\nthree\n", encoding="utf-8")
+
+    app = cli.CLIApplication()
+    lines1 = app._read_lines(str(f1))
+    assert app._read_lines(str(f1)) is lines1
+    assert app._diff_lines(lines1, ["one"]) is not app._diff_lines(lines1, ["one"])
+    app._diff_cache = cli._LRUCache()
+    entry = app._diff_lines(lines1, app._read_lines(str(f2)))
+    assert app._diff_lines(["one", "two"], ["one", "three"]) is entry
+    assert entry[2] == 2
+    assert app._diff_lines([], []) is not app._diff_lines([""], [""])
+
+
+def test_cli_lru_cache_is_bounded():
+    from src import cli
+
+    cache = cli._LRUCache(2)
+    cache.store("a", 1)
+    cache.store("b", 2)
+    assert cache.lookup("a") == 1
+    cache.store("c", 3)
+    assert list(cache) == ["a", "c"]
+    assert cli.CLIApplication()._lines_cache.maxsize == 512
+
+
+def test_color_printers_do_not_share_state():
+    import io
+    from src import cli
+
+    plain_out, color_out = io.StringIO(), io.StringIO()
+    plain = cli.ColorPrinter(use_color=False, output=plain_out)
+    colored = cli.ColorPrinter(use_color=True, output=color_out)
+    plain.print_added("x")
+    colored.print_added("x")
+    assert plain_out.getvalue() == "+x\n"
+    assert color_out.getvalue() == "\033[32m+x\033[0m\n"
+    assert cli.ANSIColors.RED == "\033[31m"
+
+
+def test_color_printer_keeps_order_with_text_writes(tmp_path):
+    from src import cli
+
+    path = tmp_path / "out.txt"
+    with open(path, "w", encoding="utf-8") as out:
+        printer = cli.ColorPrinter(use_color=False, output=out)
+        printer.print("a")
+        out.write("b\n")
+        printer.print_added("c")
+    assert path.read_text(encoding="utf-8") == "a\nb\n+c\n"
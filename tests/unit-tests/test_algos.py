@@ -7,7 +7,8 @@ from algorithms.utils import (
     script_to_tuples, tuples_to_script, count_operations,
     tokenize_lines, tokenize_words, tokenize_chars,
     get_tokenizer, join_tokens, group_consecutive_ops,
-    split_into_hunks, calculate_line_numbers
+    split_into_hunks, calculate_line_numbers, intern_pair, intern_sequence,
+    PackedScript, OP_EQUAL, common_prefix_length, common_suffix_length, pack_ops
 )
 from algorithms.myers import (
     MyersDiff, diff, patch, edit_distance, lcs_length,
@@ -17,6 +18,8 @@ from algorithms.hirschberg import (
     HirschbergDiff, diff_linear, LinearSpaceMyers,
     diff_linear_myers, DiffEngine, BatchDiffer
 )
+from algorithms.bpm import (bpm_lcs_length, bpm_edit_distance, match_masks, lcs_from_masks, levenshtein_row,
+                           levenshtein_row_from_masks)
 
 
 class TestCoreTypes(unittest.TestCase):
@@ -40,6 +43,9 @@ class TestCoreTypes(unittest.TestCase):
         self.assertEqual(make_equal('c').op, OpType.EQUAL)
         self.assertEqual(make_replace('n', 'o').old_value, 'o')
         self.assertEqual(make_insert(42).value, 42)
+        line = ''.join(['c', 'd'])
+        self.assertIs(make_equal(line).value, line)
+        self.assertEqual(make_delete(['x']).value, ['x'])
 
     def test_diff_result(self):
         script = [make_equal('a'), make_insert('b')]
@@ -100,6 +106,26 @@ class TestScriptOperations(unittest.TestCase):
         self.assertEqual(counts['deletes'], 1)
         self.assertEqual(counts['equals'], 2)
         self.assertEqual(counts['replaces'], 1)
+        self.assertEqual(count_operations(PackedScript.from_script(script)), counts)
+        
+    def test_common_affixes(self):
+        self.assertEqual(common_prefix_length(['a', 'b', 'c'], ['a', 'b', 'x']), 2)
+        self.assertEqual(common_suffix_length(['a', 'b', 'c'], ['x', 'b', 'c']), 2)
+        self.assertEqual(common_suffix_length(['a', 'a'], ['a', 'a', 'a'], 2), 0)
+        script = diff(['p', 'a', 's'], ['p', 'b', 's'])
+        self.assertEqual(script[0], make_equal('p'))
+        self.assertEqual(script[-1], make_equal('s'))
+        
+    def test_packed_script(self):
+        script = [make_equal('a'), make_delete('b'), make_replace('c', 'd')]
+        packed = PackedScript.from_script(script)
+        self.assertEqual(len(packed), 3)
+        self.assertEqual(packed.count(OP_EQUAL), 1)
+        self.assertEqual(packed.to_script(), script)
+        self.assertEqual(pack_ops(script), bytes([2, 1, 3]))
+        self.assertEqual(pack_ops(packed), bytes([2, 1, 3]))
+        packed = MyersDiff(['a', 'b', 'c'], ['a', 'x', 'c']).compute_packed()
+        self.assertEqual(list(packed), diff(['a', 'b', 'c'], ['a', 'x', 'c']))
         
     def test_group_consecutive_ops(self):
         self.assertEqual(group_consecutive_ops([]), [])
@@ -107,6 +133,13 @@ class TestScriptOperations(unittest.TestCase):
         groups = group_consecutive_ops(script)
         self.assertEqual(len(groups), 3)
         self.assertEqual(groups[0], (OpType.EQUAL, ['a', 'b']))
+        
+    def test_interning(self):
+        self.assertEqual(intern_pair(['a', 'b', 'a'], ['b', 'c']), ([0, 1, 0], [1, 2]))
+        self.assertIsNone(intern_pair([['a']], [['a']]))
+        table = {}
+        self.assertEqual(intern_sequence(['x', 'y'], table), [0, 1])
+        self.assertEqual(intern_sequence(['y', 'z'], table), [1, 2])
 
 
 class TestHunksAndLines(unittest.TestCase):
@@ -190,6 +223,13 @@ class TestDiffAndPatch(unittest.TestCase):
     def test_roundtrip(self):
         original, modified = ['a', 'b', 'c', 'd', 'e'], ['a', 'x', 'c', 'y', 'e']
         self.assertEqual(patch(original, diff(original, modified)), modified)
+        
+    def test_diff_with_key(self):
+        script = diff(['A ', 'b', 'C'], ['a', 'x', 'c'], key=lambda s: s.strip().lower())
+        self.assertEqual([(a.op, a.value) for a in script if a.op == OpType.EQUAL],
+                         [(OpType.EQUAL, 'A '), (OpType.EQUAL, 'C')])
+        unhashable = diff([['a'], ['b']], [['A'], ['c']], key=lambda v: [v[0].lower()])
+        self.assertEqual(count_operations(unhashable)['equals'], 1)
 
 
 class TestMetrics(unittest.TestCase):
@@ -213,6 +253,31 @@ class TestMetrics(unittest.TestCase):
         self.assertTrue(0.0 < ratio < 1.0)
 
 
+class TestBitParallel(unittest.TestCase):
+    def test_lcs_length(self):
+        self.assertEqual(bpm_lcs_length([], ['a']), 0)
+        self.assertEqual(bpm_lcs_length(list('abcbdab'), list('bdcaba')), 4)
+        self.assertEqual(bpm_lcs_length(list('bdcaba'), list('abcbdab')), 4)
+        self.assertEqual(bpm_lcs_length(list('x' * 200), list('x' * 150)), 150)
+
+    def test_edit_distance(self):
+        self.assertEqual(bpm_edit_distance(['a', 'b'], []), 2)
+        self.assertEqual(bpm_edit_distance(['a', 'b', 'c'], ['a', 'x', 'c']), 2)
+        self.assertEqual(edit_distance(['a', 'b'], []), 2)
+
+    def test_masks_reuse(self):
+        masks = match_masks(list('abcab'))
+        self.assertEqual(masks['a'], 0b01001)
+        self.assertEqual(lcs_from_masks(masks, 5, list('ab')), 2)
+
+    def test_levenshtein_row(self):
+        self.assertEqual(levenshtein_row(list('kitten'), list('sitting')), [6, 6, 5, 4, 3, 3, 2, 3])
+        self.assertEqual(levenshtein_row([], list('ab')), [0, 1, 2])
+        self.assertEqual(levenshtein_row(list('ab'), []), [2])
+        self.assertEqual(levenshtein_row_from_masks(match_masks(reversed('kitten')), 6, reversed('sitting')),
+                         levenshtein_row(list('nettik'), list('gnittis')))
+
+
 class TestGraphStructures(unittest.TestCase):
     def test_snake_info(self):
         snake = SnakeInfo(0, 0, 5, 5)
@@ -267,6 +332,21 @@ class TestLinearSpace(unittest.TestCase):
         script = diff_linear_myers(['a', 'b'], ['a', 'b'])
         self.assertEqual(sum(1 for a in script if a.op == OpType.EQUAL), 2)
 
+    def test_linear_space_myers_guarantees(self):
+        import random
+        rng = random.Random(0)
+        for _ in range(300):
+            head, tail = list('hh'), list('tt')
+            a = head + [rng.randrange(4) for _ in range(rng.randrange(10))] + tail
+            b = head + [rng.randrange(4) for _ in range(rng.randrange(10))] + tail
+            script = diff_linear_myers(a, b)
+            self.assertEqual([x.value for x in script if x.op != OpType.INSERT], a)
+            self.assertEqual([x.value for x in script if x.op != OpType.DELETE], b)
+            self.assertEqual(patch(a, script), b)
+            self.assertTrue(all(x.op == OpType.EQUAL for x in script[:2] + script[-2:]))
+            edits = sum(1 for x in script if x.op != OpType.EQUAL)
+            self.assertGreaterEqual(edits, sum(1 for x in diff(a, b) if x.op != OpType.EQUAL))
+
 
 class TestDiffEngine(unittest.TestCase):
     def test_modes(self):
@@ -287,6 +367,22 @@ class TestDiffEngine(unittest.TestCase):
         self.assertIn('a', lcs)
         self.assertIn('c', lcs)
         self.assertGreater(engine.compute_edit_distance(['a', 'b'], ['a', 'x']), 0)
+        linear = DiffEngine(use_linear_space=True)
+        a, b = list("abcabba"), list("cbabac")
+        script = linear.diff(a, b)
+        self.assertEqual(linear.compute_edit_distance(a, b),
+                         sum(1 for action in script if action.op is not OpType.EQUAL))
+        self.assertEqual(linear._diff_cached.cache_info().misses, 1)
+        
+    def test_cache(self):
+        engine = DiffEngine()
+        first = engine.diff(['a', 'b'], ['a', 'x'])
+        first.append(make_equal('z'))
+        self.assertEqual(engine.diff(['a', 'b'], ['a', 'x']), diff(['a', 'b'], ['a', 'x']))
+        self.assertEqual(engine._diff_cached.cache_info().hits, 1)
+        engine.clear_cache()
+        self.assertEqual(engine._diff_cached.cache_info().currsize, 0)
+        self.assertEqual(len(engine.diff([['a']], [['a'], ['b']])), 2)
 
 
 class TestBatchDiffer(unittest.TestCase):
@@ -308,6 +404,25 @@ class TestBatchDiffer(unittest.TestCase):
         bd = BatchDiffer()
         results = bd.diff_all_against_base(['a', 'b'], [['a', 'b'], ['a', 'x'], ['x', 'y']])
         self.assertEqual(len(results), 3)
+        self.assertEqual(patch(['a', 'b'], results[1]), ['a', 'x'])
+        
+    def test_parallel_backends(self):
+        pairs = [(list('abc'), list('abd')), (list('xy'), list('yx')), ([], ['z'])]
+        expected = BatchDiffer().diff_multiple(pairs)
+        for backend in ('thread', 'process'):
+            bd = BatchDiffer(max_workers=2, backend=backend)
+            self.assertEqual(bd.diff_multiple(pairs), expected)
+            self.assertEqual(bd.diff_all_against_base(list('abc'), [list('abd'), list('cab')]),
+                             BatchDiffer().diff_all_against_base(list('abc'), [list('abd'), list('cab')]))
+        with self.assertRaises(ValueError):
+            BatchDiffer(backend='gpu')
+            
+    def test_metrics_against_base(self):
+        bd = BatchDiffer()
+        base, targets = list('kitten'), [list('sitting'), list('kitten'), [], list('xyz')]
+        self.assertEqual(bd.edit_distances(base, targets), [edit_distance(base, t) for t in targets])
+        self.assertEqual(bd.similarity_ratios(base, targets), [similarity_ratio(base, t) for t in targets])
+        self.assertEqual(bd.edit_distances([['a']], [[['a'], ['b']]]), [1])
 
 
 class TestConsistency(unittest.TestCase):
@@ -4,7 +4,7 @@ import os
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
 
-from algorithms.utils import OpType, EditAction
+from algorithms.utils import OpType, EditAction, PackedScript
 from formatters.base import (
     FormatterConfig, FormatterFactory, ColorScheme, OutputWriter, OutputTarget,
     DiffHunk, HunkGenerator, SimpleFormatter, BaseFormatter
@@ -35,10 +35,26 @@ class TestColorSchemeAndWriter(unittest.TestCase):
         self.assertEqual(s.reset, '\033[0m')
         s.disable_colors()
         self.assertEqual(s.reset, '')
+        plain = ColorScheme.no_color()
+        plain.red = 'X'
+        plain.disable_colors()
+        self.assertEqual(ColorScheme.no_color().red, '')
         w = OutputWriter(OutputTarget.STRING)
         w.write("a")
         w.writeln("b")
         self.assertEqual(w.get_output(), "ab\n")
+        
+    def test_file_writer_buffers_until_flush(self):
+        import io
+        out = io.StringIO()
+        w = OutputWriter(OutputTarget.FILE, out)
+        w.writeln("a")
+        self.assertEqual(out.getvalue(), "")
+        w.flush()
+        self.assertEqual(out.getvalue(), "a\n")
+        self.assertEqual(w.get_output(), "")
+        w.write("x" * 200000)
+        self.assertEqual(len(out.getvalue()), 200002)
 
 
 class TestHunks(unittest.TestCase):
@@ -48,6 +64,12 @@ class TestHunks(unittest.TestCase):
         self.assertTrue(h.has_changes())
         g = HunkGenerator()
         self.assertEqual(len(g.generate([])), 0)
+        script = [EditAction(OpType.EQUAL, str(i)) for i in range(10)]
+        script[2] = EditAction(OpType.DELETE, "x")
+        script[8] = EditAction(OpType.INSERT, "y")
+        hunks = g.generate(PackedScript.from_script(script))
+        self.assertEqual([h.actions for h in hunks], [h.actions for h in g.generate(script)])
+        self.assertEqual(hunks[0].actions, script)
 
 
 class TestSimpleAndFactory(unittest.TestCase):
@@ -62,6 +84,24 @@ class TestSimpleAndFactory(unittest.TestCase):
         with self.assertRaises(ValueError):
             FormatterFactory.create("unknown")
 
+    def test_registration_survives_lazy_sibling_import(self):
+        import subprocess
+        src = os.path.join(os.path.dirname(__file__), '..', '..', 'src')
+        code = ("import sys; sys.path.insert(0, sys.argv[1])\n"
+                "from formatters import FormatterFactory, SimpleFormatter\n"
+                "class Mine(SimpleFormatter): pass\n"
+                "FormatterFactory.register('json', Mine)\n"
+                "FormatterFactory.create('html')\n"
+                "print(type(FormatterFactory.create('json')).__name__)")
+        proc = subprocess.run([sys.executable, "-c", code, src], capture_output=True, text=True)
+        self.assertEqual(proc.stdout.strip(), "Mine", proc.stderr)
+
+    def test_available_keeps_registration_order(self):
+        FormatterFactory.create("json")
+        self.assertEqual(FormatterFactory.available()[:11], [
+            "simple", "unified", "context", "normal", "side-by-side", "compact", "word", "inline",
+            "html", "html-side-by-side", "json"])
+
 
 class TestUnifiedFormatters(unittest.TestCase):
     def test_unified(self):
@@ -78,6 +118,8 @@ class TestSideBySide(unittest.TestCase):
         self.assertGreater(c.content_width, 0)
         t = TextTruncator(10)
         self.assertEqual(len(t.truncate("very long string here")), 10)
+        self.assertEqual(t.fit("very long string here"), t.truncate_and_pad("very long string here"))
+        self.assertEqual(t.fit("ab"), "ab        ")
         f = LineNumberFormatter(width=4)
         self.assertEqual(f.format(1), "   1")
         r = SideBySideRow(1, "a", 1, "a", OpType.EQUAL)
@@ -108,6 +150,7 @@ class TestOtherFormatters(unittest.TestCase):
         self.assertIn("[-x-]", WordDiffFormatter(config).format(script, "a", "b"))
         self.assertIn("--- a", InlineDiffFormatter(config).format(script, "a", "b"))
         self.assertIn("identical", CompactSideBySideFormatter(config).format([EditAction(OpType.EQUAL, "x")], "a", "b"))
+        self.assertIn("|", CompactSideBySideFormatter(config).format(script, "a", "b"))
 
 
 class TestEdgeCases(unittest.TestCase):
@@ -126,6 +169,14 @@ class TestFormatterIntegration(unittest.TestCase):
         for name in FormatterFactory.available():
             self.assertIsInstance(FormatterFactory.create(name, config).format(script, "a", "b"), str)
 
+    def test_packed_scripts(self):
+        config = FormatterConfig(use_color=False)
+        script = [EditAction(OpType.EQUAL, "a"), EditAction(OpType.DELETE, "<b>"), EditAction(OpType.INSERT, "c")]
+        packed = PackedScript.from_script(script)
+        for name in FormatterFactory.available():
+            formatter = FormatterFactory.create(name, config)
+            self.assertEqual(formatter.format(packed, "a", "b"), formatter.format(script, "a", "b"))
+
     def test_has_changes(self):
         config = FormatterConfig(use_color=False)
         f = SimpleFormatter(config)